@@ -0,0 +1,299 @@
+"""JSON API: ленты, записи, комментарии и профили только для чтения,
+плюс массовые подписка и отметки «нравится».
+
+Строки берутся через ``.values()`` и отдаются как есть, без моделей и
+шаблонов. ``?fields=id,text`` оставляет в ответе только перечисленные
+поля, и запрос не присоединяет таблицы ради остальных. Списки листаются
+по ``?cursor=`` из поля ``next``; ETag и кэш страниц для гостей те же,
+что у HTML-страниц.
+"""
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_http_methods
+
+from yatube.settings import (COMMENTS_PER_PAGE, FOLLOW_BULK_LIMIT,
+                             LIKE_BULK_LIMIT, POSTS_PER_PAGE)
+
+from . import conditional, follows, generations, likes, timeline
+from .models import Comment, Group, Post
+from .page_cache import cache_anonymous
+from .pagination import COMMENT_ORDERING, FEED_ORDERING, CursorPaginator
+
+User = get_user_model()
+
+# Имя поля в ответе -> путь для ``.values()``.
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comments_count": "comments_count",
+}
+COMMENT_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "created": "created",
+    "author": "author__username",
+    "parent": "parent_id",
+    "depth": "depth",
+}
+PROFILE_FIELDS = {
+    "username": "username",
+    "first_name": "first_name",
+    "last_name": "last_name",
+    "posts_count": "stats__posts_count",
+    "followers_count": "stats__followers_count",
+    "following_count": "stats__following_count",
+}
+
+COMPACT = {"separators": (",", ":"), "ensure_ascii": False}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=COMPACT)
+
+
+def api_methods(*methods):
+    """Разрешить только ``methods``; ошибки отдаются JSON, а не
+    HTML-страницей."""
+    def decorator(view):
+        @require_http_methods(methods)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return _response({"detail": "Не найдено"}, status=404)
+            except BadRequest as error:
+                return _response({"detail": str(error)}, status=400)
+        return wrapper
+    return decorator
+
+
+api_view = api_methods("GET")
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _response({"detail": "Нужна авторизация"}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _fields(request, fields):
+    """Запрошенные поля ответа из ``?fields=``, по умолчанию все."""
+    names = request.GET.get("fields")
+    if not names:
+        return list(fields)
+    names = list(dict.fromkeys(name for name in names.split(",") if name))
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise BadRequest(f"Неизвестные поля: {', '.join(unknown)}")
+    return names
+
+
+def _columns(fields, names, *extra):
+    return list(dict.fromkeys([fields[name] for name in names] + list(extra)))
+
+
+def _serialize(row, fields, names):
+    item = {name: row[fields[name]] for name in names}
+    if item.get("image"):
+        storage = Post._meta.get_field("image").storage
+        item["image"] = storage.url(item["image"])
+    return item
+
+
+def _page(request, rows, per_page, ordering):
+    paginator = CursorPaginator(rows, per_page, ordering)
+    return paginator.get_page(request.GET.get("cursor"))
+
+
+def _posts(request, posts):
+    names = _fields(request, POST_FIELDS)
+    keys = [key.lstrip("-") for key in FEED_ORDERING]
+    rows = posts.values(*_columns(POST_FIELDS, names, *keys))
+    page = _page(request, rows, POSTS_PER_PAGE, FEED_ORDERING)
+    return _response({
+        "results": [_serialize(row, POST_FIELDS, names) for row in page],
+        "next": page.next_cursor,
+    })
+
+
+@api_view
+@condition(etag_func=conditional.feed_etag(generations.INDEX))
+@cache_anonymous(generations.INDEX)
+def index(request):
+    return _posts(request, Post.objects.all())
+
+
+@api_view
+@condition(etag_func=conditional.feed_etag(generations.GROUP))
+@cache_anonymous(generations.GROUP)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only("id"), slug=slug)
+    return _posts(request, group.posts.all())
+
+
+@api_view
+@condition(etag_func=conditional.feed_etag(generations.PROFILE))
+@cache_anonymous(generations.PROFILE)
+def profile(request, username):
+    names = _fields(request, PROFILE_FIELDS)
+    rows = User.objects.filter(username=username).values(
+        *_columns(PROFILE_FIELDS, names))
+    row = next(iter(rows[:1]), None)
+    if row is None:
+        raise Http404
+    return _response(_serialize(row, PROFILE_FIELDS, names))
+
+
+@api_view
+@condition(etag_func=conditional.feed_etag(generations.PROFILE))
+@cache_anonymous(generations.PROFILE)
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only("id"), username=username)
+    return _posts(request, author.posts.all())
+
+
+@api_view
+@condition(etag_func=conditional.post_etag)
+@cache_anonymous(generations.POST, generations.PROFILE)
+def post_view(request, username, post_id):
+    names = _fields(request, POST_FIELDS)
+    rows = Post.objects.filter(id=post_id, author__username=username)
+    rows = rows.order_by().values(*_columns(POST_FIELDS, names))
+    row = next(iter(rows[:1]), None)
+    if row is None:
+        raise Http404
+    return _response(_serialize(row, POST_FIELDS, names))
+
+
+@api_view
+@condition(etag_func=conditional.post_etag)
+@cache_anonymous(generations.POST, generations.PROFILE)
+def comments(request, username, post_id):
+    """Страница корневых комментариев, у каждого — ответы в ``replies``
+    в порядке обхода ветки."""
+    post = get_object_or_404(Post.objects.only("id"),
+                             id=post_id, author__username=username)
+    names = _fields(request, COMMENT_FIELDS)
+    keys = [key.lstrip("-") for key in COMMENT_ORDERING]
+    columns = _columns(COMMENT_FIELDS, names, "path", *keys)
+    page = _page(request, post.comments.roots().values(*columns),
+                 COMMENTS_PER_PAGE, COMMENT_ORDERING)
+    results, by_path = [], {}
+    for row in page:
+        item = _serialize(row, COMMENT_FIELDS, names)
+        item["replies"] = []
+        results.append(item)
+        by_path[row["path"]] = item
+    if by_path:
+        for row in post.comments.replies_to(by_path).values(*columns):
+            root = by_path.get(row["path"][:Comment.PATH_STEP])
+            if root is not None:
+                root["replies"].append(
+                    _serialize(row, COMMENT_FIELDS, names))
+    return _response({"results": results, "next": page.next_cursor})
+
+
+@api_view
+@api_login_required
+@condition(etag_func=conditional.follow_etag)
+def follow_index(request):
+    return _posts(request, timeline.feed(request.user))
+
+
+def _usernames(values):
+    if not isinstance(values, list) or not all(
+            isinstance(value, str) for value in values):
+        raise BadRequest("Ожидается список имён пользователей")
+    if len(values) > FOLLOW_BULK_LIMIT:
+        raise BadRequest(f"Не больше {FOLLOW_BULK_LIMIT} имён за раз")
+    return values
+
+
+@api_methods("GET", "POST")
+@api_login_required
+@transaction.atomic
+def follow_status(request):
+    """Статус подписки на нескольких авторов.
+
+    GET ``?usernames=a,b`` только читает. POST с телом ``{"follow":
+    [...], "unfollow": [...]}`` сначала подписывает и отписывает в
+    одной транзакции. Ответ — ``{"имя": true | false}`` по всем
+    упомянутым авторам.
+    """
+    if request.method == "GET":
+        names = request.GET.get("usernames", "")
+        usernames = _usernames([name for name in names.split(",") if name])
+    else:
+        try:
+            body = json.loads(request.body or b"{}")
+        except ValueError:
+            raise BadRequest("Тело запроса — не JSON")
+        if not isinstance(body, dict):
+            raise BadRequest("Ожидается объект JSON")
+        to_follow = _usernames(body.get("follow", []))
+        to_unfollow = _usernames(body.get("unfollow", []))
+        follows.follow(request.user, to_follow)
+        follows.unfollow(request.user, to_unfollow)
+        usernames = to_follow + to_unfollow
+    return _response(follows.statuses(request.user, usernames))
+
+
+def _post_ids(values):
+    if not isinstance(values, list) or not all(
+            isinstance(value, int) and not isinstance(value, bool)
+            for value in values):
+        raise BadRequest("Ожидается список номеров записей")
+    if len(values) > LIKE_BULK_LIMIT:
+        raise BadRequest(f"Не больше {LIKE_BULK_LIMIT} записей за раз")
+    return values
+
+
+@api_methods("GET", "POST")
+@transaction.atomic
+def like_status(request):
+    """Отметки «нравится» нескольких записей.
+
+    GET ``?posts=1,2`` только читает, гостям тоже. POST с телом
+    ``{"like": [...], "unlike": [...]}`` сначала ставит и снимает
+    отметки. Ответ — ``{"номер": {"likes": 5, "liked": true}}`` по всем
+    упомянутым записям, одним запросом.
+    """
+    if request.method == "GET":
+        try:
+            post_ids = [int(value) for value in
+                        request.GET.get("posts", "").split(",") if value]
+        except ValueError:
+            raise BadRequest("Ожидается список номеров записей")
+        post_ids = _post_ids(post_ids)
+    else:
+        if not request.user.is_authenticated:
+            return _response({"detail": "Нужна авторизация"}, status=401)
+        try:
+            body = json.loads(request.body or b"{}")
+        except ValueError:
+            raise BadRequest("Тело запроса — не JSON")
+        if not isinstance(body, dict):
+            raise BadRequest("Ожидается объект JSON")
+        to_like = _post_ids(body.get("like", []))
+        to_unlike = _post_ids(body.get("unlike", []))
+        likes.like(request.user, to_like)
+        likes.unlike(request.user, to_unlike)
+        post_ids = to_like + to_unlike
+    return _response(likes.statuses(request.user, post_ids))
@@ -0,0 +1,20 @@
+from django.urls import path
+
+from . import api
+
+app_name = "api"
+
+urlpatterns = [
+    path("posts/", api.index, name="index"),
+    path("follow/", api.follow_index, name="follow_index"),
+    path("follow/status/", api.follow_status, name="follow_status"),
+    path("likes/", api.like_status, name="like_status"),
+    path("groups/<slug:slug>/posts/", api.group_posts, name="group"),
+    path("users/<str:username>/", api.profile, name="profile"),
+    path("users/<str:username>/posts/", api.profile_posts,
+         name="profile_posts"),
+    path("users/<str:username>/posts/<int:post_id>/", api.post_view,
+         name="post"),
+    path("users/<str:username>/posts/<int:post_id>/comments/",
+         api.comments, name="comments"),
+]
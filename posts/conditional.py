@@ -0,0 +1,105 @@
+"""Валидаторы для условных GET-запросов (ETag).
+
+Валидатор считается до рендера страницы: для лент это поколения из
+кэша, для записи — один запрос по первичному ключу, для ленты подписок —
+номера записей её страницы и их поколения. Для записи результат
+запроса кэшируется под её поколениями, так что повторная проверка
+обходится без базы.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from yatube.settings import POSTS_PER_PAGE
+
+from . import generations, notifications, timeline
+from .models import Post
+from .pagination import get_page
+
+
+def _viewer(request, feed_marker=True):
+    """Читатель и всё, от чего зависят значки непрочитанного в шапке.
+
+    Число новых записей в ленте подписок входит с тем же пределом, что
+    и на значке: новая запись автора меняет ETag любой страницы.
+    """
+    if not request.user.is_authenticated:
+        return "anon"
+    parts = [request.user.pk, notifications.unread_count(request.user)]
+    if feed_marker:
+        parts.append(timeline.unread_for(request))
+    return ":".join(map(str, parts))
+
+
+def _etag(request, *parts, viewer=None):
+    parts = (viewer or _viewer(request),
+             request.GET.get("page", ""),
+             request.GET.get("cursor", ""),
+             request.GET.get("fields", "")) + parts
+    return hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+
+
+def feed_etag(*scopes):
+    """ETag страницы, которая меняется только вместе с поколениями."""
+    def etag(request, *args, **kwargs):
+        generation = generations.get(
+            *(scope.format(**kwargs) for scope in scopes))
+        return _etag(request, generation)
+    return etag
+
+
+def follow_list_etag(request, username):
+    """Список зависит и от автора, и от подписок самого читателя."""
+    scopes = [generations.profile(username)]
+    if request.user.is_authenticated:
+        scopes.append(generations.profile(request.user.username))
+    return _etag(request, generations.get(*scopes))
+
+
+def _post_state(request, username, post_id):
+    if hasattr(request, "_post_state"):
+        return request._post_state
+    generation = generations.get(generations.post(post_id),
+                                 generations.profile(username))
+    key = f"post-state:{post_id}:{username}:{generation}"
+    state = cache.get(key)
+    if state is None:
+        # Не first(): его ORDER BY по дате SQLite сортирует во временном
+        # B-дереве даже для одной строки.
+        rows = list(
+            Post.objects.filter(pk=post_id, author__username=username)
+            .order_by().values("updated", "comments_count")[:1]
+        )
+        state = rows[0] if rows else None
+        if state is not None:
+            state["generation"] = generation
+            cache.set(key, state)
+    request._post_state = state
+    return state
+
+
+def post_etag(request, username, post_id):
+    state = _post_state(request, username, post_id)
+    if state is None:
+        return None
+    return _etag(request, state["updated"].isoformat(),
+                 state["comments_count"], state["generation"])
+
+
+def follow_etag(request):
+    """ETag страницы ленты подписок.
+
+    Читаются только строки этой страницы, тем же запросом по индексу,
+    что и сама страница. Счётчик комментариев меняется через
+    ``update()`` без ``updated``, поэтому в ETag входят поколения
+    записей: комментарий их сдвигает.
+    """
+    rows = timeline.feed(request.user).values("id", "pub_date", "updated")
+    page = get_page(request, rows, POSTS_PER_PAGE)
+    window = [(row["id"], row["updated"].isoformat()) for row in page]
+    generation = generations.get(
+        *(generations.post(post_id) for post_id, _ in window))
+    # Сама лента сдвигает отметку просмотра, и счётчик на ней всегда
+    # пуст, так что отметка в её ETag не входит.
+    return _etag(request, window, generation,
+                 viewer=_viewer(request, feed_marker=False))
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import (Comment, Follow, Group, Like, LikeShard, Post,
+                     UserStats)
+
+User = get_user_model()
+
+
+def _shift(deltas):
+    return {name: Greatest(F(name) + delta, 0)
+            for name, delta in deltas.items()}
+
+
+def _count(model, field):
+    rows = model.objects.filter(**{field: OuterRef("pk")}).order_by()
+    rows = rows.values(field).annotate(total=Count("pk")).values("total")
+    return Coalesce(Subquery(rows), 0)
+
+
+def bump_post(post_id, **deltas):
+    Post.objects.filter(pk=post_id).update(**_shift(deltas))
+
+
+def bump_user(user_id, **deltas):
+    UserStats.objects.filter(pk=user_id).update(**_shift(deltas))
+
+
+def add_group_post(post):
+    Group.objects.filter(pk=post.group_id).update(
+        last_post=post, **_shift({"posts_count": 1}))
+
+
+def _latest(model, field):
+    rows = model.objects.filter(**{field: OuterRef("pk")})
+    return Subquery(rows.order_by("-pub_date", "-id").values("pk")[:1])
+
+
+def reconcile_users(user_ids):
+    """Пересчитать счётчики пользователей с нуля."""
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    return UserStats.objects.filter(pk__in=user_ids).update(
+        followers_count=_count(Follow, "author"),
+        following_count=_count(Follow, "user"),
+        posts_count=_count(Post, "author"),
+    )
+
+
+@transaction.atomic
+def reconcile_posts(post_ids):
+    """Пересчитать счётчики комментариев и отметок записей с нуля.
+
+    Неперенесённые шарды отметок при этом уже не нужны.
+    """
+    LikeShard.objects.filter(post_id__in=post_ids).delete()
+    return Post.objects.filter(pk__in=post_ids).update(
+        comments_count=_count(Comment, "post"),
+        likes_count=_count(Like, "post"))
+
+
+def reconcile_groups(group_ids):
+    """Пересчитать число записей и последнюю запись групп с нуля."""
+    return Group.objects.filter(pk__in=group_ids).update(
+        posts_count=_count(Post, "group"),
+        last_post=_latest(Post, "group"))
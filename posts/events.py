@@ -0,0 +1,198 @@
+"""Уведомления о новых записях через Server-Sent Events.
+
+Шина живёт в памяти процесса: поток событий держит цикл событий
+ASGI-сервера (``yatube.asgi``), а публикует запись обычный код Django
+из потоков того же процесса. Подписка хранит только счётчик новых
+записей, поэтому пачка публикаций между двумя отправками сливается в
+одно событие «N новых записей».
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+
+from .models import Follow
+
+INDEX = "index"
+FOLLOW = "follow:{user_id}"
+
+# Не больше параметров в одном IN, чем разрешает SQLite.
+_CHUNK = 500
+
+_lock = threading.Lock()
+_subscriptions = defaultdict(set)
+
+
+def follow(user_id):
+    return FOLLOW.format(user_id=user_id)
+
+
+class Subscription:
+    """Счётчик новых записей одного соединения."""
+
+    def __init__(self, topic, user_id=None):
+        self.topic = topic
+        self.user_id = user_id
+        self.count = 0
+        self.loop = asyncio.get_running_loop()
+        self.changed = asyncio.Event()
+
+    def _bump(self):
+        self.count += 1
+        self.changed.set()
+
+    def notify(self):
+        """Потокобезопасно: счётчик меняется в цикле событий."""
+        self.loop.call_soon_threadsafe(self._bump)
+
+
+def subscribe(topic, user_id=None):
+    subscription = Subscription(topic, user_id)
+    with _lock:
+        _subscriptions[topic].add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        subscribers = _subscriptions.get(subscription.topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del _subscriptions[subscription.topic]
+
+
+def publish(*topics):
+    with _lock:
+        subscribers = [subscription for topic in topics
+                       for subscription in _subscriptions.get(topic, ())]
+    for subscription in subscribers:
+        try:
+            subscription.notify()
+        except RuntimeError:
+            # Цикл событий уже закрыт, соединения больше нет.
+            unsubscribe(subscription)
+
+
+def listeners():
+    """Пользователи, у которых сейчас открыта лента подписок."""
+    with _lock:
+        return {subscription.user_id
+                for topic, subscribers in _subscriptions.items()
+                if topic != INDEX
+                for subscription in subscribers}
+
+
+def publish_post(post):
+    """Сообщить о записи главной ленте и подписчикам автора на связи.
+
+    Подписчики ищутся только среди подключённых, так что у популярного
+    автора не перебираются все подписки.
+    """
+    publish(INDEX)
+    connected = sorted(listeners())
+    followers = Follow.objects.filter(author_id=post.author_id)
+    for start in range(0, len(connected), _CHUNK):
+        user_ids = followers.filter(
+            user_id__in=connected[start:start + _CHUNK]
+        ).values_list("user_id", flat=True)
+        publish(*map(follow, user_ids))
+
+
+def _session_user_id(session_key):
+    engine = import_module(settings.SESSION_ENGINE)
+    request = SimpleNamespace(session=engine.SessionStore(session_key))
+    try:
+        user = get_user(request)
+        return user.pk if user.is_authenticated else None
+    finally:
+        close_old_connections()
+
+
+async def _user_id(scope):
+    cookies = SimpleCookie()
+    for name, value in scope.get("headers", ()):
+        if name == b"cookie":
+            cookies.load(value.decode("latin-1"))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _session_user_id, morsel.value)
+
+
+async def _disconnected(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def _event(count):
+    data = json.dumps({"count": count})
+    return f"event: new-posts\ndata: {data}\n\n".encode()
+
+
+async def _respond(send, status, body):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+    await send({"type": "http.response.body", "body": body.encode()})
+
+
+async def stream(scope, receive, send):
+    """ASGI-приложение потока событий.
+
+    ``?feed=index`` — новые записи на главной, ``?feed=follow`` — в
+    ленте подписок, только для вошедших пользователей.
+    """
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    feed = query.get("feed", [INDEX])[0]
+    if feed == INDEX:
+        subscription = subscribe(INDEX)
+    elif feed == "follow":
+        user_id = await _user_id(scope)
+        if user_id is None:
+            await _respond(send, 401, "Нужна авторизация")
+            return
+        subscription = subscribe(follow(user_id), user_id)
+    else:
+        await _respond(send, 404, "Неизвестная лента")
+        return
+    disconnect = asyncio.ensure_future(_disconnected(receive))
+    changed = None
+    try:
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"),
+                                (b"cache-control", b"no-cache"),
+                                (b"x-accel-buffering", b"no")]})
+        await send({"type": "http.response.body",
+                    "body": b"retry: 10000\n\n", "more_body": True})
+        while True:
+            if changed is None:
+                changed = asyncio.ensure_future(
+                    subscription.changed.wait())
+            done, _ = await asyncio.wait(
+                {changed, disconnect},
+                timeout=settings.EVENTS_KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED)
+            if disconnect in done:
+                break
+            if changed in done:
+                subscription.changed.clear()
+                changed = None
+                body = _event(subscription.count)
+            else:
+                body = b": keepalive\n\n"
+            await send({"type": "http.response.body", "body": body,
+                        "more_body": True})
+    finally:
+        unsubscribe(subscription)
+        for task in (changed, disconnect):
+            if task is not None:
+                task.cancel()
@@ -0,0 +1,86 @@
+"""Подписки одним запросом.
+
+Подписка — ``INSERT ... SELECT`` по именам авторов с ``ON CONFLICT DO
+NOTHING``, отписка — один ``DELETE``. Оба возвращают через
+``RETURNING`` только реально изменённые строки, и сигналы модели
+(лента, счётчики, поколения) отправляются ровно для них, как после
+``save()`` и ``delete()``. Уведомления о новых подписках пишутся
+одним запросом на всех авторов. Повторный или одновременный клик не
+упирается в ``unique_following``.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+
+from . import notifications
+from .models import Follow
+
+User = get_user_model()
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def _rows(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [Follow(id=follow_id, user_id=user_id, author_id=author_id,
+                       pull=bool(pull))
+                for follow_id, user_id, author_id, pull in cursor.fetchall()]
+
+
+def follow(user, usernames):
+    """Подписать ``user`` на авторов ``usernames``; вернуть новые подписки.
+
+    На себя подписаться нельзя, несуществующие имена пропускаются.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return []
+    follows = _rows(
+        f"INSERT INTO {Follow._meta.db_table} (user_id, author_id, pull) "
+        f"SELECT %s, id, %s FROM {User._meta.db_table} "
+        f"WHERE username IN ({_placeholders(usernames)}) AND id <> %s "
+        f"ON CONFLICT DO NOTHING "
+        f"RETURNING id, user_id, author_id, pull",
+        [user.pk, False, *usernames, user.pk])
+    for instance in follows:
+        post_save.send(sender=Follow, instance=instance, created=True,
+                       update_fields=None, raw=False, using=connection.alias)
+    notifications.followed(follows)
+    return follows
+
+
+def unfollow(user, usernames):
+    """Отписать ``user`` от авторов ``usernames``; вернуть удалённые."""
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return []
+    follows = _rows(
+        f"DELETE FROM {Follow._meta.db_table} WHERE user_id = %s "
+        f"AND author_id IN (SELECT id FROM {User._meta.db_table} "
+        f"WHERE username IN ({_placeholders(usernames)})) "
+        f"RETURNING id, user_id, author_id, pull",
+        [user.pk, *usernames])
+    for instance in follows:
+        post_delete.send(sender=Follow, instance=instance,
+                         using=connection.alias)
+    return follows
+
+
+def statuses(user, usernames):
+    """Подписан ли ``user`` на каждого из ``usernames`` — одним запросом."""
+    usernames = list(dict.fromkeys(usernames))
+    following = set(
+        Follow.objects.filter(user=user, author__username__in=usernames)
+        .values_list("author__username", flat=True))
+    return {username: username in following for username in usernames}
+
+
+def followed_among(user, user_ids):
+    """Кого из ``user_ids`` читает ``user`` — одним запросом."""
+    if not user.is_authenticated or not user_ids:
+        return set()
+    return set(Follow.objects.filter(user=user, author_id__in=user_ids)
+               .values_list("author_id", flat=True))
@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm, Textarea
+from PIL import Image
 
+from . import images
 from .models import Comment, Post
 
 
@@ -9,10 +14,70 @@ class PostForm(ModelForm):
         fields = ["group", "text", "image"]
         widgets = {"text": Textarea(attrs={"placeholder": "Введите текст"})}
 
+    transcoded = None
+
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        if isinstance(image, UploadedFile):
+            try:
+                self.transcoded = images.transcode(image)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                raise ValidationError("Не удалось обработать изображение")
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        if self.transcoded is not None:
+            post.image = images.store(Post._meta.get_field("image"),
+                                      self.transcoded)
+        if commit:
+            post.save()
+            self._save_m2m()
+        return post
+
 
 class CommentForm(ModelForm):
+    """Комментарий к записи или ответ на комментарий из ``parent``.
+
+    Ответ глубже ``COMMENT_MAX_DEPTH`` прикрепляется к самому глубокому
+    допустимому предку, чтобы ветка не уходила вправо бесконечно.
+    """
+
     class Meta:
         model = Comment
         fields = ["text"]
         widgets = {"text": Textarea(
             attrs={"placeholder": "Введите комментарий"})}
+
+    def __init__(self, *args, post=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.post = post
+        self.parent = None
+
+    def _parent(self):
+        parent_id = self.data.get("parent")
+        if not parent_id or self.post is None:
+            return None
+        try:
+            parent = self.post.comments.get(pk=int(parent_id))
+        except (ValueError, Comment.DoesNotExist):
+            raise ValidationError("Комментарий, на который вы отвечаете, "
+                                  "не найден")
+        while parent.depth >= settings.COMMENT_MAX_DEPTH:
+            parent = parent.parent
+        if parent.replies.count() >= settings.COMMENT_MAX_REPLIES:
+            raise ValidationError("На этот комментарий уже ответили "
+                                  "слишком много раз")
+        return parent
+
+    def clean(self):
+        cleaned_data = super().clean()
+        self.parent = self._parent()
+        return cleaned_data
+
+    def save(self, commit=True):
+        comment = super().save(commit=False)
+        comment.parent = self.parent
+        if commit:
+            comment.save()
+        return comment
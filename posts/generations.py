@@ -0,0 +1,71 @@
+"""Счётчики поколений для ключей кэша.
+
+Каждая область (главная, группа, профиль, запись) имеет свой номер
+поколения, который входит в ключ закэшированного фрагмента. Запись в
+базу увеличивает номер, и старые фрагменты просто перестают читаться.
+"""
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+
+INDEX = "index"
+GROUP = "group:{slug}"
+PROFILE = "profile:{username}"
+POST = "post:{post_id}"
+
+
+def group(slug):
+    return GROUP.format(slug=slug)
+
+
+def profile(username):
+    return PROFILE.format(username=username)
+
+
+def post(post_id):
+    return POST.format(post_id=post_id)
+
+
+def _key(scope):
+    return f"generation:{scope}"
+
+
+def get(*scopes):
+    """Вернуть строку с текущими поколениями областей."""
+    return ".".join(map(str, get_each(scopes)))
+
+
+def get_each(scopes):
+    """Поколения всех ``scopes`` списком — одним обращением к кэшу."""
+    keys = [_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        # После вытеснения ключа счёт начинается со времени, а не с
+        # единицы, чтобы не совпасть со старыми фрагментами.
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        values.update(cache.get_many(missing))
+    return [values.get(key, 0) for key in keys]
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = _key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def post_scopes(instance):
+    """Области, в которых показывается запись."""
+    scopes = [INDEX, post(instance.pk)]
+    try:
+        scopes.append(profile(instance.author.username))
+        if instance.group_id:
+            scopes.append(group(instance.group.slug))
+    except ObjectDoesNotExist:
+        pass
+    return scopes
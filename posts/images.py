@@ -0,0 +1,64 @@
+"""Хранение картинок к записям по содержимому.
+
+Загруженная картинка поворачивается по EXIF, уменьшается до
+``POST_IMAGE_MAX_SIZE`` и перекодируется в WebP и запасной JPEG без
+метаданных. Имя файла — SHA-256 от WebP, поэтому одинаковые картинки
+в разных записях лежат в одном файле.
+"""
+import hashlib
+import io
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+Transcoded = namedtuple("Transcoded", ["digest", "webp", "jpeg"])
+
+_CONTENT_NAME = re.compile(r"(?P<stem>.*/[0-9a-f]{2}/[0-9a-f]{64})\.webp$")
+
+
+def _encode(image, format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def transcode(upload):
+    """Перекодировать загруженный файл; Pillow не получает метаданных."""
+    upload.seek(0)
+    with Image.open(upload) as source:
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail(settings.POST_IMAGE_MAX_SIZE, Image.LANCZOS)
+        transparent = (image.mode in ("RGBA", "LA", "PA")
+                       or "transparency" in image.info)
+        image = image.convert("RGBA" if transparent else "RGB")
+    webp = _encode(image, "WEBP", quality=80, method=4)
+    if transparent:
+        flat = Image.new("RGB", image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel("A"))
+        image = flat
+    jpeg = _encode(image, "JPEG", quality=85, optimize=True,
+                   progressive=True)
+    return Transcoded(hashlib.sha256(webp).hexdigest(), webp, jpeg)
+
+
+def fallback_name(name):
+    """Имя запасного JPEG для картинки, сохранённой по содержимому."""
+    match = _CONTENT_NAME.match(name or "")
+    if match is None:
+        return None
+    return f"{match.group('stem')}.jpg"
+
+
+def store(field, transcoded):
+    """Сохранить оба варианта, если их ещё нет, и вернуть имя WebP."""
+    digest = transcoded.digest
+    name = f"{field.upload_to.rstrip('/')}/{digest[:2]}/{digest}.webp"
+    variants = ((name, transcoded.webp),
+                (fallback_name(name), transcoded.jpeg))
+    for path, content in variants:
+        if not field.storage.exists(path):
+            field.storage.save(path, ContentFile(content))
+    return name
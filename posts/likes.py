@@ -0,0 +1,147 @@
+"""Отметки «нравится» с шардированным счётчиком.
+
+Сами отметки — уникальные строки ``(user, post)``: поставить и снять
+их можно одним ``INSERT ... ON CONFLICT DO NOTHING`` или ``DELETE``, и
+``RETURNING`` сообщает, что действительно изменилось. Счётчик записи
+при этом не трогается: изменение ±1 прибавляется к одной из
+``LIKE_SHARDS`` строк ``LikeShard``, выбранной случайно, так что
+одновременные отметки популярной записи не выстраиваются в очередь за
+одной строкой. ``flush()`` (команда ``flush_likes``) пачками переносит
+накопленное в ``Post.likes_count``, удаляет шарды и сдвигает поколения
+записей, так что закэшированные страницы показывают новое число.
+
+Гостям страницы отдают ``likes_count`` — число на момент последнего
+переноса — прямо из кэша. Точное число (``likes_count`` плюс сумма
+шардов) вместе с тем, отмечал ли запись читатель, вошедшим читается
+одним запросом на страницу.
+"""
+import random
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Subquery,
+                              Sum, Value)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import generations
+from .models import Like, LikeShard, Post
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def _shift(post_ids, delta):
+    """Прибавить ``delta`` к случайному шарду каждой из ``post_ids``."""
+    if not post_ids:
+        return
+    table = LikeShard._meta.db_table
+    values = ", ".join(["(%s, %s, %s)"] * len(post_ids))
+    params = []
+    for post_id in post_ids:
+        params += [post_id, random.randrange(settings.LIKE_SHARDS), delta]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (post_id, shard, delta) VALUES {values} "
+            f"ON CONFLICT (post_id, shard) "
+            f"DO UPDATE SET delta = delta + excluded.delta",
+            params)
+
+
+def _changed(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [post_id for post_id, in cursor.fetchall()]
+
+
+def like(user, post_ids):
+    """Отметить записи ``post_ids``; вернуть номера новых отметок.
+
+    Несуществующие записи пропускаются.
+    """
+    post_ids = list(dict.fromkeys(post_ids))
+    if not post_ids:
+        return []
+    liked = _changed(
+        f"INSERT INTO {Like._meta.db_table} (user_id, post_id, created) "
+        f"SELECT %s, id, %s FROM {Post._meta.db_table} "
+        f"WHERE id IN ({_placeholders(post_ids)}) "
+        f"ON CONFLICT DO NOTHING RETURNING post_id",
+        [user.pk, timezone.now(), *post_ids])
+    _shift(liked, 1)
+    return liked
+
+
+def unlike(user, post_ids):
+    """Снять отметки с ``post_ids``; вернуть номера снятых."""
+    post_ids = list(dict.fromkeys(post_ids))
+    if not post_ids:
+        return []
+    unliked = _changed(
+        f"DELETE FROM {Like._meta.db_table} WHERE user_id = %s "
+        f"AND post_id IN ({_placeholders(post_ids)}) RETURNING post_id",
+        [user.pk, *post_ids])
+    _shift(unliked, -1)
+    return unliked
+
+
+def forget(user, batch_size=300):
+    """Вычесть из шардов отметки удаляемого ``user``.
+
+    Сами строки ``Like`` удалит каскад, не проходя через ``unlike()``.
+    Записи самого ``user`` удаляются вместе с ним и шарды не получают.
+    """
+    post_ids = list(Like.objects.filter(user=user)
+                    .exclude(post__author=user)
+                    .values_list("post_id", flat=True))
+    for start in range(0, len(post_ids), batch_size):
+        _shift(post_ids[start:start + batch_size], -1)
+
+
+def _pending():
+    shards = LikeShard.objects.filter(post=OuterRef("pk")).order_by()
+    return Coalesce(Subquery(shards.values("post").annotate(
+        total=Sum("delta")).values("total")), 0)
+
+
+def statuses(user, post_ids):
+    """Число отметок и отметил ли ``user`` каждую из ``post_ids``.
+
+    Один запрос: шарды и отметка читателя — коррелированные
+    подзапросы по уникальным индексам.
+    """
+    if user.is_authenticated:
+        liked = Exists(Like.objects.filter(user=user, post=OuterRef("pk")))
+    else:
+        liked = Value(False, output_field=BooleanField())
+    rows = (Post.objects.filter(pk__in=post_ids).order_by()
+            .annotate(pending=_pending(), liked=liked)
+            .values_list("pk", "likes_count", "pending", "liked"))
+    return {pk: {"likes": max(count + pending, 0), "liked": bool(mine)}
+            for pk, count, pending, mine in rows}
+
+
+def flush(batch_size=500):
+    """Перенести шарды в ``Post.likes_count``; вернуть число записей.
+
+    Каждая пачка — отдельная короткая транзакция: сумма шардов и их
+    удаление идут под одной блокировкой записи, поэтому прибавленное
+    в это время не теряется. Поколения сдвигаются после фиксации.
+    """
+    flushed = 0
+    while True:
+        with transaction.atomic():
+            post_ids = list(LikeShard.objects.order_by("post_id")
+                            .values_list("post_id", flat=True)
+                            .distinct()[:batch_size])
+            if not post_ids:
+                return flushed
+            Post.objects.filter(pk__in=post_ids).update(
+                likes_count=Greatest(F("likes_count") + _pending(), 0))
+            LikeShard.objects.filter(post_id__in=post_ids).delete()
+        posts = Post.objects.filter(pk__in=post_ids).select_related(
+            "author", "group").order_by()
+        generations.bump(*{scope for post in posts
+                           for scope in generations.post_scopes(post)})
+        flushed += len(post_ids)
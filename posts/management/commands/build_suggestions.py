@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает рекомендации «кого почитать» для читателей, "
+            "чьи подписки изменились")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="Пересчитать всех читателей")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = suggestions.rebuild(full=options["full"],
+                                    batch_size=options["batch_size"])
+        self.stdout.write(f"Пересчитано читателей: {total}")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ("Удаляет затухшие оценки популярности и всё ниже "
+            "TRENDING_SIZE лучших")
+
+    def handle(self, *args, **options):
+        removed = trending.compact()
+        self.stdout.write(f"Удалено оценок: {removed}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import likes
+
+
+class Command(BaseCommand):
+    help = "Переносит накопленные отметки «нравится» в счётчики записей"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        flushed = likes.flush(options["batch_size"])
+        self.stdout.write(f"Обновлено записей: {flushed}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Строит миниатюры всех размеров для картинок к записям"
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image="").order_by("id")
+        names = names.values_list("image", flat=True)
+        generated = 0
+        for name in names.iterator():
+            thumbnails.generate(name)
+            generated += 1
+        self.stdout.write(f"Обработано картинок: {generated}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "Заново строит полнотекстовый индекс записей и комментариев"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options["batch_size"]
+        with transaction.atomic():
+            search.clear()
+            posts = self.fill(search.POST, Post.objects.all(), size)
+            comments = self.fill(search.COMMENT, Comment.objects.all(), size)
+        self.stdout.write(
+            f"Проиндексировано записей: {posts}, комментариев: {comments}")
+
+    def fill(self, kind, queryset, size):
+        last = total = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last).order_by("pk")
+                        .values_list("pk", "text")[:size])
+            if not rows:
+                return total
+            search.index_many(kind, rows)
+            total += len(rows)
+            last = rows[-1][0]
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def batches(queryset, size):
+    last = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last).order_by("pk")
+                   .values_list("pk", flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает счётчики подписок, записей и комментариев "
+            "и последние записи групп")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options["batch_size"]
+        users = posts = groups = 0
+        for ids in batches(User.objects.all(), size):
+            users += counters.reconcile_users(ids)
+        for ids in batches(Post.objects.all(), size):
+            posts += counters.reconcile_posts(ids)
+        for ids in batches(Group.objects.all(), size):
+            groups += counters.reconcile_groups(ids)
+        self.stdout.write(
+            f"Пересчитано пользователей: {users}, записей: {posts}, "
+            f"групп: {groups}")
@@ -0,0 +1,25 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Timeline
+
+BATCH = 500
+
+
+class Command(BaseCommand):
+    help = "Обрезает ленты подписок до TIMELINE_LENGTH записей"
+
+    def handle(self, *args, **options):
+        user_ids = Timeline.objects.order_by("user_id")
+        user_ids = user_ids.values_list("user_id", flat=True).distinct()
+        user_ids = user_ids.iterator()
+        trimmed = 0
+        while True:
+            batch = list(islice(user_ids, BATCH))
+            if not batch:
+                break
+            timeline.trim(batch)
+            trimmed += len(batch)
+        self.stdout.write(f"Обработано лент: {trimmed}")
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+CREATE = """
+CREATE VIRTUAL TABLE posts_search USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+FILL = """
+INSERT INTO posts_search (rowid, text)
+SELECT id * 2, text FROM posts_post
+UNION ALL
+SELECT id * 2 + 1, text FROM posts_comment
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_updated'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, "DROP TABLE posts_search"),
+        migrations.RunSQL(FILL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_group_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='follow_seen',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Лента подписок просмотрена'),
+        ),
+    ]
@@ -1,24 +1,92 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.query import ModelIterable
+from django.utils import timezone
+
+from . import thumbnails
 
 User = get_user_model()
 
 
+class UserStats(models.Model):
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="stats",
+                                verbose_name="Пользователь")
+    followers_count = models.PositiveIntegerField("Подписчиков", default=0)
+    following_count = models.PositiveIntegerField("Подписок", default=0)
+    posts_count = models.PositiveIntegerField("Записей", default=0)
+    follow_seen = models.DateTimeField("Лента подписок просмотрена",
+                                       null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.user}'
+
+
 class Group(models.Model):
     title = models.CharField(verbose_name="Группа",
                              max_length=200,
                              help_text="Название группы")
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
+    posts_count = models.PositiveIntegerField("Записей", default=0,
+                                              editable=False)
+    last_post = models.ForeignKey("Post",
+                                  on_delete=models.SET_NULL,
+                                  null=True,
+                                  editable=False,
+                                  related_name="+",
+                                  verbose_name="Последняя запись")
+
+    class Meta:
+        # Каталог идёт по (title, id): rowid в конце индекса.
+        indexes = [
+            models.Index(fields=["title"], name="group_title_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    _with_thumbnails = False
+
+    def for_feed(self):
+        """Всё, что нужно карточке записи, без запросов на каждую строку."""
+        return self.select_related("author", "group").with_thumbnails()
+
+    def with_thumbnails(self):
+        """Подгрузить миниатюры картинок всех записей одним запросом.
+
+        Как и ``prefetch_related``, срабатывает при выполнении запроса.
+        Пагинатор читает страницу до рендера, поэтому миниатюры
+        подгружаются и тогда, когда фрагмент ленты взят из кэша;
+        пропускает их только страница, целиком отданная из кэша гостю.
+        """
+        clone = self._chain()
+        clone._with_thumbnails = True
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_thumbnails = self._with_thumbnails
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is None
+        super()._fetch_all()
+        if (fetched and self._with_thumbnails
+                and self._iterable_class is ModelIterable):
+            thumbnails.attach(self._result_cache)
+
+
 class Post(models.Model):
     text = models.TextField("Текст",
                             help_text="Введите текст вашего сообщения")
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name="posts",
@@ -35,18 +103,73 @@ class Post(models.Model):
                               upload_to="posts/",
                               blank=True,
                               null=True)
+    comments_count = models.PositiveIntegerField("Комментариев", default=0)
+    likes_count = models.PositiveIntegerField("Отметок «нравится»",
+                                              default=0)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
+        # Ленты сортируются по (-pub_date, -id); SQLite дописывает rowid
+        # в конец индекса и читает его в обратном порядке без сортировки.
+        indexes = [
+            models.Index(fields=["pub_date"], name="post_pub_date_idx"),
+            models.Index(fields=["author", "pub_date"],
+                         name="post_author_pub_date_idx"),
+            models.Index(fields=["group", "pub_date"],
+                         name="post_group_pub_date_idx"),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class CommentManager(models.Manager):
+    def roots(self):
+        return self.filter(parent=None)
+
+    def replies_to(self, paths):
+        """Ответы к веткам с корнями ``paths`` в порядке обхода дерева.
+
+        Может захватить ветки других корней между крайними путями.
+        """
+        paths = sorted(paths)
+        return self.filter(parent__isnull=False,
+                           path__gt=paths[0],
+                           path__lt=paths[-1] + "~").order_by("path")
+
+    def attach_replies(self, roots):
+        """Разложить по ``root.replies_tree`` ответы ко всем ``roots``.
+
+        Пути ответов лежат между путями крайних корней, поэтому все
+        ветки берутся одним запросом по диапазону индекса ``(post,
+        path)`` сразу в порядке обхода дерева.
+        """
+        roots = list(roots)
+        for root in roots:
+            root.replies_tree = []
+        if not roots:
+            return roots
+        by_path = {root.path: root for root in roots}
+        replies = self.replies_to(by_path).select_related("author")
+        for reply in replies:
+            root = by_path.get(reply.path[:Comment.PATH_STEP])
+            if root is not None:
+                root.replies_tree.append(reply)
+        return roots
+
+
 class Comment(models.Model):
+    # Путь — цепочка первичных ключей предков и самого комментария,
+    # каждый в PATH_STEP шестнадцатеричных знаков: лексикографический
+    # порядок путей совпадает с обходом дерева.
+    PATH_STEP = 8
+
     text = models.TextField("Комментарий",
                             help_text="Введите текст вашего сообщения")
     created = models.DateTimeField("Дата комментария", auto_now_add=True)
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name="comments",
@@ -54,13 +177,41 @@ class Comment(models.Model):
     post = models.ForeignKey(Post,
                              on_delete=models.CASCADE,
                              related_name="comments")
+    parent = models.ForeignKey("self",
+                               on_delete=models.CASCADE,
+                               blank=True,
+                               null=True,
+                               related_name="replies",
+                               verbose_name="Ответ на")
+    path = models.CharField("Путь в ветке", max_length=255,
+                            default="", editable=False)
+    depth = models.PositiveSmallIntegerField("Глубина", default=0,
+                                             editable=False)
+
+    objects = CommentManager()
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["post", "created"],
+                         name="comment_post_created_idx"),
+            models.Index(fields=["post", "path"],
+                         name="comment_post_path_idx"),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        created = self.pk is None
+        if created and self.parent_id is not None:
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
+        if created:
+            prefix = self.parent.path if self.parent_id else ""
+            self.path = f"{prefix}{self.pk:0{self.PATH_STEP}x}"
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -71,6 +222,10 @@ class Follow(models.Model):
                                on_delete=models.CASCADE,
                                related_name="following",
                                verbose_name="Автор")
+    pull = models.BooleanField("Чтение без рассылки",
+                               default=False,
+                               help_text="Записи автора не рассылаются "
+                                         "по лентам, а читаются при показе")
 
     class Meta:
         ordering = ["-user"]
@@ -78,6 +233,231 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=["user", "author"], name="unique_following")
         ]
+        indexes = [
+            models.Index(fields=["author", "user"],
+                         name="follow_author_user_idx"),
+            # Списки подписчиков и подписок, новые первыми.
+            models.Index(fields=["author", "id"],
+                         name="follow_author_id_idx"),
+            models.Index(fields=["user", "id"],
+                         name="follow_user_id_idx"),
+        ]
 
     def __str__(self):
         return f'{self.user} -> {self.author}'
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name="timeline",
+                             verbose_name="Читатель")
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name="timeline_entries",
+                             verbose_name="Запись")
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        ordering = ["-pub_date"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_post")
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"],
+                         name="timeline_user_feed_idx")
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.post_id}'
+
+
+class SuggestionQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Готовые рекомендации без авторов, на которых уже подписан."""
+        followed = Follow.objects.filter(user=user).values("author")
+        return (self.filter(user=user)
+                .exclude(author__in=followed)
+                .select_related("author")
+                .order_by("rank"))
+
+
+class Suggestion(models.Model):
+    """Кого почитать: заранее посчитанный список по графу подписок."""
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name="suggestions",
+                             verbose_name="Читатель")
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name="+",
+                               verbose_name="Автор")
+    rank = models.PositiveSmallIntegerField("Место")
+    score = models.FloatField("Оценка")
+
+    objects = SuggestionQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["user", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="unique_suggestion")
+        ]
+        indexes = [
+            models.Index(fields=["user", "rank"],
+                         name="suggestion_user_rank_idx"),
+        ]
+
+    def __str__(self):
+        return f'{self.user} ? {self.author}'
+
+
+class FollowChange(models.Model):
+    """Изменённое ребро графа подписок, ещё не учтённое в рекомендациях.
+
+    Без внешних ключей: запись переживает удаление пользователя.
+    """
+
+    user_id = models.IntegerField("Подписчик")
+    author_id = models.IntegerField("Автор")
+
+    def __str__(self):
+        return f'{self.user_id} ~ {self.author_id}'
+
+
+class TrendingPost(models.Model):
+    """Оценка популярности записи, см. ``posts.trending``."""
+
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="trend",
+                                verbose_name="Запись")
+    score = models.FloatField("Логарифм оценки")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score"], name="trending_post_score_idx"),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score}'
+
+
+class TrendingGroup(models.Model):
+    """Оценка популярности группы, см. ``posts.trending``."""
+
+    group = models.OneToOneField(Group,
+                                 on_delete=models.CASCADE,
+                                 primary_key=True,
+                                 related_name="trend",
+                                 verbose_name="Группа")
+    score = models.FloatField("Логарифм оценки")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score"],
+                         name="trending_group_score_idx"),
+        ]
+
+    def __str__(self):
+        return f'{self.group_id}: {self.score}'
+
+
+class Notification(models.Model):
+    """Уведомление во входящих, см. ``posts.notifications``.
+
+    Пока уведомление не просмотрено, новые события того же вида (к той
+    же записи) сливаются в него: растёт ``events_count``, а ``actor`` —
+    последний, кто их вызвал.
+    """
+
+    COMMENT = "comment"
+    FOLLOW = "follow"
+    KINDS = ((COMMENT, "Комментарии"), (FOLLOW, "Подписчики"))
+
+    recipient = models.ForeignKey(User,
+                                  on_delete=models.CASCADE,
+                                  related_name="notifications",
+                                  verbose_name="Получатель")
+    kind = models.CharField("Вид", max_length=16, choices=KINDS)
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             null=True,
+                             related_name="+",
+                             verbose_name="Запись")
+    actor = models.ForeignKey(User,
+                              on_delete=models.CASCADE,
+                              related_name="+",
+                              verbose_name="Последний участник")
+    events_count = models.PositiveIntegerField("Событий", default=1)
+    seen = models.BooleanField("Просмотрено", default=False)
+    updated = models.DateTimeField("Дата изменения", default=timezone.now)
+
+    class Meta:
+        # Непросмотренное уведомление одно на вид и запись; у подписок
+        # записи нет, а NULL в уникальном индексе не совпадают, поэтому
+        # ограничений два.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipient", "kind", "post"],
+                condition=models.Q(seen=False, post__isnull=False),
+                name="unique_unseen_post_notification"),
+            models.UniqueConstraint(
+                fields=["recipient", "kind"],
+                condition=models.Q(seen=False, post__isnull=True),
+                name="unique_unseen_notification"),
+        ]
+        indexes = [
+            models.Index(fields=["recipient", "updated"],
+                         name="notification_inbox_idx"),
+            models.Index(fields=["recipient", "seen"],
+                         name="notification_unseen_idx"),
+        ]
+
+    def __str__(self):
+        return f'{self.recipient_id} <- {self.kind} x{self.events_count}'
+
+
+class Like(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name="likes",
+                             verbose_name="Пользователь")
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name="likes",
+                             verbose_name="Запись")
+    created = models.DateTimeField("Дата", auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_like")
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} ♥ {self.post_id}'
+
+
+class LikeShard(models.Model):
+    """Ещё не перенесённое в ``Post.likes_count`` изменение счётчика,
+    см. ``posts.likes``."""
+
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name="like_shards",
+                             verbose_name="Запись")
+    shard = models.PositiveSmallIntegerField("Номер")
+    delta = models.IntegerField("Изменение", default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "shard"], name="unique_like_shard")
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}/{self.shard}: {self.delta:+}'
@@ -0,0 +1,90 @@
+"""Входящие уведомления: новые подписчики и комментарии к записям.
+
+Событие записывается одним ``INSERT ... ON CONFLICT DO UPDATE`` по
+частичному уникальному индексу непросмотренных: пока получатель не
+открыл входящие, события одного вида (к одной записи) сливаются в одну
+строку — «5 комментариев к записи» вместо пяти. Подписка на нескольких
+авторов сразу пишется одним запросом на всех.
+
+Число непросмотренных для значка в шапке лежит в кэше и сбрасывается
+при каждой записи и просмотре, так что страница стоит не больше одного
+запроса по индексу ``(recipient, seen)``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import Notification
+
+# Условия должны совпадать с условиями уникальных индексов, иначе
+# SQLite не найдёт, с каким из них разрешать конфликт.
+_TARGETS = {
+    True: '(recipient_id, kind, post_id) '
+          'WHERE "post_id" IS NOT NULL AND "seen" = 0',
+    False: '(recipient_id, kind) WHERE "post_id" IS NULL AND "seen" = 0',
+}
+
+
+def _key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def _write(kind, rows):
+    """Записать события ``(получатель, запись, участник)`` одного вида.
+
+    У всех строк запись либо есть, либо нет.
+    """
+    if not rows:
+        return
+    now = timezone.now()
+    table = Notification._meta.db_table
+    values = ", ".join(["(%s, %s, %s, %s, 1, %s, %s)"] * len(rows))
+    params = []
+    for recipient_id, post_id, actor_id in rows:
+        params += [recipient_id, kind, post_id, actor_id, False, now]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (recipient_id, kind, post_id, actor_id, "
+            f"events_count, seen, updated) VALUES {values} "
+            f"ON CONFLICT {_TARGETS[rows[0][1] is not None]} "
+            f"DO UPDATE SET events_count = events_count + 1, "
+            f"actor_id = excluded.actor_id, updated = excluded.updated",
+            params)
+    cache.delete_many([_key(recipient_id) for recipient_id, _, _ in rows])
+
+
+def followed(follows):
+    """Сообщить авторам о новых подписках ``follows``."""
+    _write(Notification.FOLLOW,
+           [(follow.author_id, None, follow.user_id) for follow in follows])
+
+
+def commented(comment):
+    """Сообщить автору записи о комментарии, если он не его собственный."""
+    author_id = comment.post.author_id
+    if author_id != comment.author_id:
+        _write(Notification.COMMENT,
+               [(author_id, comment.post_id, comment.author_id)])
+
+
+def inbox(user):
+    return (Notification.objects.filter(recipient=user)
+            .select_related("actor", "post__author"))
+
+
+def unread_count(user):
+    """Непросмотренные уведомления, не больше ``UNREAD_LIMIT + 1``."""
+    key = _key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        limit = settings.UNREAD_LIMIT + 1
+        unseen = Notification.objects.filter(recipient=user, seen=False)
+        count = len(unseen.values_list("id", flat=True)[:limit])
+        cache.set(key, count, None)
+    return count
+
+
+def mark_seen(user):
+    Notification.objects.filter(recipient=user, seen=False).update(seen=True)
+    cache.set(_key(user.pk), 0, None)
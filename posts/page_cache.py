@@ -0,0 +1,45 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import generations
+
+
+def _page_key(request, generation):
+    parts = (request.path,
+             request.GET.get("page", ""),
+             request.GET.get("cursor", ""),
+             request.GET.get("fields", ""),
+             generation)
+    digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+    return f"page:{digest}"
+
+
+def cache_anonymous(*scopes):
+    """Кэшировать страницу целиком для гостей.
+
+    ``scopes`` — шаблоны областей из ``generations``, которые заполняются
+    аргументами view, например ``generations.GROUP`` -> ``group:{slug}``.
+    Ключ включает текущие поколения, поэтому запись в базу сразу делает
+    старые страницы недостижимыми. Запрос с cookie сессии в кэш не
+    ходит: проверить пользователя без базы нельзя.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ("GET", "HEAD")
+                    or settings.SESSION_COOKIE_NAME in request.COOKIES):
+                return view(request, *args, **kwargs)
+            generation = generations.get(
+                *(scope.format(**kwargs) for scope in scopes))
+            key = _page_key(request, generation)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
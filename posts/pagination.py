@@ -0,0 +1,178 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+FEED_ORDERING = ("-pub_date", "-id")
+COMMENT_ORDERING = ("-created", "-id")
+FOLLOW_ORDERING = ("-id",)
+GROUP_ORDERING = ("title", "id")
+NOTIFICATION_ORDERING = ("-updated", "-id")
+
+
+def _value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def _dump(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+class CursorPage:
+    """Страница ленты, построенная по курсору, а не по номеру.
+
+    Повторяет ту часть интерфейса ``Page``, которой пользуются шаблоны.
+    """
+
+    by_cursor = True
+
+    def __init__(self, object_list, cursor=None,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<CursorPage {self.cursor or 'first'}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация: следующая страница ищется по значениям ключей
+    последней записи, поэтому стоимость запроса не зависит от глубины.
+
+    Последний ключ в ``ordering`` должен быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = ordering
+        self.keys = [key.lstrip("-") for key in ordering]
+
+    def encode(self, row, backwards=False):
+        values = [_dump(_value(row, key)) for key in self.keys]
+        payload = json.dumps([backwards] + values).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            backwards, *values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()))
+            if len(values) != len(self.keys):
+                return None
+            opts = self.object_list.model._meta
+            values = [opts.get_field(key).to_python(value)
+                      for key, value in zip(self.keys, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+        if None in values:
+            return None
+        return values, bool(backwards)
+
+    def _seek(self, values, backwards):
+        condition = Q()
+        equal = {}
+        for key, ordering, value in zip(self.keys, self.ordering, values):
+            descending = ordering.startswith("-") != backwards
+            lookup = "lt" if descending else "gt"
+            condition |= Q(**equal, **{f"{key}__{lookup}": value})
+            equal[key] = value
+        return condition
+
+    def _ordering(self, backwards):
+        if not backwards:
+            return self.ordering
+        return [key[1:] if key.startswith("-") else f"-{key}"
+                for key in self.ordering]
+
+    def get_page(self, cursor):
+        position = self.decode(cursor) if cursor else None
+        backwards = position is not None and position[1]
+        rows = self.object_list
+        if position is not None:
+            rows = rows.filter(self._seek(*position))
+        rows = list(
+            rows.order_by(*self._ordering(backwards))[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, position is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode(rows[0], backwards=True)
+        return CursorPage(rows, cursor, next_cursor, previous_cursor)
+
+
+def _first_page(cursor_paginator):
+    """Первая страница по курсору, но в виде ``Page``.
+
+    ``COUNT(*)`` не выполняется: вместо числа записей у пагинатора —
+    сколько строк прочитано, включая строку сверх страницы. Этого
+    хватает, чтобы ``has_next()`` отвечал верно.
+    """
+    first = cursor_paginator.get_page(None)
+    paginator = Paginator(cursor_paginator.object_list,
+                          cursor_paginator.per_page)
+    paginator.count = len(first) + first.has_next()
+    page = Page(first.object_list, 1, paginator)
+    page.by_cursor = True
+    page.next_cursor = first.next_cursor
+    page.previous_cursor = None
+    return page
+
+
+def get_page(request, object_list, per_page, ordering=FEED_ORDERING,
+             count=None):
+    """Страница по ``?cursor=...``; ``?page=N`` остаётся для старых ссылок.
+
+    Первая страница тоже строится по курсору. В режиме номеров страниц
+    к ``Page`` дописывается ``next_cursor``, чтобы кнопка «Показать
+    ещё» дальше шла уже по курсору. Если число записей уже известно
+    (``count``), ``COUNT(*)`` не выполняется и для номеров.
+    """
+    object_list = object_list.order_by(*ordering)
+    cursor = request.GET.get("cursor")
+    cursor_paginator = CursorPaginator(object_list, per_page, ordering)
+    if cursor is not None:
+        return cursor_paginator.get_page(cursor)
+    if request.GET.get("page") is None:
+        return _first_page(cursor_paginator)
+    paginator = Paginator(object_list, per_page)
+    if count is not None:
+        paginator.count = count
+    page = paginator.get_page(request.GET.get("page"))
+    page.next_cursor = None
+    if page.has_next():
+        page.next_cursor = cursor_paginator.encode(page[-1])
+    return page
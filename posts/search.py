@@ -0,0 +1,158 @@
+"""Полнотекстовый поиск по записям и комментариям на SQLite FTS5.
+
+Тексты лежат в виртуальной таблице ``posts_search``. Записи и
+комментарии делят одно пространство ``rowid``: чётные — записи,
+нечётные — комментарии, поэтому обновление и удаление идут по
+первичному ключу индекса без просмотра таблицы.
+"""
+import base64
+import json
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Post
+from .pagination import CursorPage
+
+TABLE = "posts_search"
+POST, COMMENT = 0, 1
+
+_MARK_START, _MARK_END = "\x02", "\x03"
+_WORD = re.compile(r"\w+")
+
+
+class Hit:
+    """Найденная запись или комментарий с подсвеченным фрагментом."""
+
+    def __init__(self, post, comment, snippet):
+        self.post = post
+        self.comment = comment
+        self.snippet = snippet
+
+
+def _rowid(kind, pk):
+    return pk * 2 + kind
+
+
+def match_expression(query):
+    """Превратить ввод пользователя в безопасное выражение MATCH.
+
+    Каждое слово берётся в кавычки, последнее ищется по префиксу.
+    """
+    words = _WORD.findall(query or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def index(kind, pk, text):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s",
+                       [_rowid(kind, pk)])
+        cursor.execute(f"INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)",
+                       [_rowid(kind, pk), text])
+
+
+def remove(kind, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s",
+                       [_rowid(kind, pk)])
+
+
+def clear():
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+
+
+def index_many(kind, rows):
+    """Добавить пачку пар (pk, текст) одним ``executemany``."""
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)",
+            [(_rowid(kind, pk), text) for pk, text in rows])
+
+
+def matching(kind, query):
+    """Подзапрос с ключами объектов ``kind``, подходящих под запрос.
+
+    Годится для ``filter(pk__in=...)``, например в поиске админки.
+    """
+    expression = match_expression(query) or '""'
+    return RawSQL(
+        f"SELECT rowid / 2 FROM {TABLE} "
+        f"WHERE {TABLE} MATCH %s AND rowid %% 2 = %s",
+        [expression, kind])
+
+
+def _encode(rank, rowid):
+    payload = json.dumps([rank, rowid]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def _decode(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, rowid = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(rank), int(rowid)
+    except (ValueError, TypeError):
+        return None
+
+
+def _highlight(snippet):
+    return mark_safe(escape(snippet)
+                     .replace(_MARK_START, "<mark>")
+                     .replace(_MARK_END, "</mark>"))
+
+
+def _hits(rows):
+    post_ids = [rowid // 2 for rowid, _ in rows if rowid % 2 == POST]
+    comment_ids = [rowid // 2 for rowid, _ in rows if rowid % 2 == COMMENT]
+    posts = Post.objects.for_feed().in_bulk(post_ids)
+    comments = Comment.objects.select_related(
+        "author", "post__author").in_bulk(comment_ids)
+    hits = []
+    for rowid, snippet in rows:
+        if rowid % 2 == POST:
+            post, comment = posts.get(rowid // 2), None
+        else:
+            comment = comments.get(rowid // 2)
+            post = comment.post if comment else None
+        # Индекс может на мгновение отставать от удалений.
+        if post is not None:
+            hits.append(Hit(post, comment, _highlight(snippet)))
+    return hits
+
+
+def search(query, cursor=None, per_page=10):
+    """Страница результатов, лучшие совпадения первыми.
+
+    Сортировка по (bm25, rowid), следующая страница ищется по этим
+    значениям последней строки.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return CursorPage([], cursor)
+    position = _decode(cursor) if cursor else None
+    sql = (f"SELECT rowid, snippet({TABLE}, 0, %s, %s, '…', 16), rank "
+           f"FROM {TABLE} WHERE {TABLE} MATCH %s")
+    params = [_MARK_START, _MARK_END, expression]
+    if position is not None:
+        sql += " AND (rank > %s OR (rank = %s AND rowid > %s))"
+        rank, rowid = position
+        params += [rank, rank, rowid]
+    sql += " ORDER BY rank, rowid LIMIT %s"
+    params.append(per_page + 1)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = _encode(rows[-1][2], rows[-1][0])
+    return CursorPage(_hits([(rowid, snippet) for rowid, snippet, _ in rows]),
+                      cursor, next_cursor)
@@ -0,0 +1,188 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, generations, likes, search, timeline, trending
+from .models import Comment, Follow, FollowChange, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.push(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, posts_count=1)
+        if instance.group_id:
+            counters.add_group_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_moved_post(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, "_previous_group_id", None)
+    if not created and not raw and previous != instance.group_id:
+        counters.reconcile_groups(
+            [pk for pk in (previous, instance.group_id) if pk])
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    if instance.group_id:
+        counters.reconcile_groups([instance.group_id])
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, comments_count=-1)
+
+
+@receiver(pre_delete, sender=User)
+def forget_likes(sender, instance, **kwargs):
+    likes.forget(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, followers_count=1)
+        counters.bump_user(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers_count=-1)
+    counters.bump_user(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def record_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        FollowChange.objects.create(user_id=instance.user_id,
+                                    author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def record_deleted_follow(sender, instance, **kwargs):
+    FollowChange.objects.create(user_id=instance.user_id,
+                                author_id=instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    instance._previous_group = instance._previous_group_id = None
+    if instance.pk and not raw:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            "group_id", "group__slug").first()
+        if previous:
+            instance._previous_group_id, instance._previous_group = previous
+
+
+@receiver([post_save, post_delete], sender=Post)
+def expire_post_pages(sender, instance, **kwargs):
+    scopes = generations.post_scopes(instance)
+    previous = getattr(instance, "_previous_group", None)
+    if previous:
+        scopes.append(generations.group(previous))
+    generations.bump(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def expire_comment_pages(sender, instance, **kwargs):
+    try:
+        post = instance.post
+    except Post.DoesNotExist:
+        return
+    generations.bump(*generations.post_scopes(post))
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def expire_follow_pages(sender, instance, **kwargs):
+    usernames = User.objects.filter(
+        pk__in=(instance.user_id, instance.author_id)
+    ).values_list("username", flat=True)
+    generations.bump(*map(generations.profile, usernames))
+
+
+@receiver(post_save, sender=User)
+def expire_user_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generations.bump(generations.profile(instance.username))
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = None
+    if instance.pk and not raw:
+        previous = Group.objects.filter(pk=instance.pk)
+        instance._previous_slug = previous.values_list(
+            "slug", flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def expire_group_pages(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, "_previous_slug", None)}
+    generations.bump(*(generations.group(slug) for slug in slugs if slug))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(search.POST, instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove(search.POST, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(search.COMMENT, instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.remove(search.COMMENT, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def trend_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.post_published(instance)
+
+
+@receiver(post_save, sender=Comment)
+def trend_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.comment_added(instance)
@@ -0,0 +1,31 @@
+from django import template
+
+from posts import images, thumbnails
+
+register = template.Library()
+
+
+def _srcset(files):
+    return ", ".join(f"{thumbnail.url} {width}w" for width, thumbnail in files)
+
+
+@register.inclusion_tag("inclusions/post_image.html")
+def post_image(post):
+    image = post.image
+    if not image:
+        return {}
+    ready = getattr(post, "thumbnails", None)
+    if ready is None:
+        ready = thumbnails.ready(image)
+    fallback = ready.get("image/jpeg")
+    if fallback:
+        return {"sources": [(mime, _srcset(files))
+                            for mime, files in ready.items()
+                            if mime != "image/jpeg"],
+                "src": fallback[len(fallback) // 2][1].url,
+                "srcset": _srcset(fallback)}
+    jpeg = images.fallback_name(image.name)
+    if jpeg is None:
+        return {"src": image.url}
+    return {"sources": [("image/webp", image.url)],
+            "src": image.storage.url(jpeg)}
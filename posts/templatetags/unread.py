@@ -0,0 +1,32 @@
+from django import template
+from django.conf import settings
+
+from posts import notifications, timeline
+
+register = template.Library()
+
+
+def _label(count):
+    limit = settings.UNREAD_LIMIT
+    return f"{limit}+" if count > limit else str(count or "")
+
+
+@register.simple_tag(takes_context=True)
+def unread_posts(context):
+    """Подпись счётчика новых записей в ленте подписок: «», «5», «99+».
+
+    Считается один раз за запрос, сколько бы раз ни выводилась.
+    """
+    request = context.get("request")
+    if request is None or not request.user.is_authenticated:
+        return ""
+    return _label(timeline.unread_for(request))
+
+
+@register.simple_tag(takes_context=True)
+def unread_notifications(context):
+    """Подпись счётчика непросмотренных уведомлений, из кэша."""
+    request = context.get("request")
+    if request is None or not request.user.is_authenticated:
+        return ""
+    return _label(notifications.unread_count(request.user))
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="W.White",
+                                              first_name="Уолтер")
+        cls.reader = User.objects.create_user(username="J.Pinkman")
+        cls.group = Group.objects.create(title="Лос-Поллос", slug="pollos")
+        for number in range(POSTS_PER_PAGE + 3):
+            Post.objects.create(text=f"Формула {number}", author=cls.author,
+                                group=cls.group)
+        cls.post = Post.objects.create(text="Скажи моё имя",
+                                       author=cls.author)
+        cls.root = Comment.objects.create(text="Гейзенберг",
+                                          post=cls.post, author=cls.reader)
+        cls.reply = Comment.objects.create(text="Верно", post=cls.post,
+                                           author=cls.author,
+                                           parent=cls.root)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.post_kwargs = {"username": self.author.username,
+                            "post_id": self.post.id}
+
+    def test_feed_cursor_walks_every_post_once(self):
+        url = reverse("api:index")
+        seen, cursor = [], None
+        while True:
+            data = self.guest_client.get(
+                url, {"cursor": cursor} if cursor else {}).json()
+            seen.extend(item["id"] for item in data["results"])
+            cursor = data["next"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, list(Post.objects.order_by(
+            "-pub_date", "-id").values_list("id", flat=True)))
+
+    def test_sparse_fields_skip_unrequested_joins(self):
+        url = reverse("api:group", kwargs={"slug": self.group.slug})
+        with CaptureQueriesContext(connection) as captured:
+            data = self.guest_client.get(url, {"fields": "id,text"}).json()
+        self.assertEqual(set(data["results"][0]), {"id", "text"})
+        sql = captured.captured_queries[-1]["sql"]
+        self.assertNotIn('"auth_user"', sql)
+        self.assertNotIn('JOIN "posts_group"', sql)
+
+    def test_unknown_field_is_bad_request(self):
+        response = self.guest_client.get(reverse("api:index"),
+                                         {"fields": "id,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["detail"])
+
+    def test_missing_post_is_json_404(self):
+        response = self.guest_client.get(reverse(
+            "api:post", kwargs={"username": self.author.username,
+                                "post_id": 0}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_post_and_profile(self):
+        post = self.guest_client.get(
+            reverse("api:post", kwargs=self.post_kwargs)).json()
+        self.assertEqual(post["text"], self.post.text)
+        self.assertEqual(post["author"], self.author.username)
+        self.assertEqual(post["comments_count"], 2)
+        profile = self.guest_client.get(reverse(
+            "api:profile", kwargs={"username": self.author.username})).json()
+        self.assertEqual(profile["first_name"], "Уолтер")
+        self.assertEqual(profile["posts_count"], POSTS_PER_PAGE + 4)
+
+    def test_comments_nest_replies_under_root(self):
+        data = self.guest_client.get(
+            reverse("api:comments", kwargs=self.post_kwargs),
+            {"fields": "id,parent"}).json()
+        self.assertEqual(data["results"], [{
+            "id": self.root.id,
+            "parent": None,
+            "replies": [{"id": self.reply.id, "parent": self.root.id}],
+        }])
+
+    def test_follow_feed_requires_login(self):
+        url = reverse("api:follow_index")
+        self.assertEqual(self.guest_client.get(url).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        client = Client()
+        client.force_login(self.reader)
+        data = client.get(url, {"fields": "id"}).json()
+        self.assertEqual(data["results"][0]["id"], self.post.id)
+        self.assertEqual(len(data["results"]), POSTS_PER_PAGE)
+
+    def test_etag_answers_not_modified(self):
+        url = reverse("api:post", kwargs=self.post_kwargs)
+        etag = self.guest_client.get(url)["ETag"]
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        other = self.guest_client.get(url, {"fields": "id"})
+        self.assertNotEqual(other["ETag"], etag)
+
+    def test_follow_feed_etag_follows_comment_counters(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse("api:follow_index")
+        etag = client.get(url)["ETag"]
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Comment.objects.create(text="Йо", post=self.post, author=self.reader)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["comments_count"], 3)
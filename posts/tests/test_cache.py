@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from yatube.cache import TwoTierCache
+
+
+def _write_in_child(location, key, value):
+    TwoTierCache(location, {}).set(key, value)
+
+
+def _incr_in_child(location, key, times):
+    cache = TwoTierCache(location, {})
+    for _ in range(times):
+        cache.incr(key)
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, "cache.bin")
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_cache(self, **options):
+        return TwoTierCache(self.location, {"OPTIONS": options})
+
+    def run_in_child(self, target, *args):
+        process = multiprocessing.get_context("fork").Process(
+            target=target, args=(self.location, *args))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+
+    def test_set_get_delete(self):
+        self.cache.set("agent", {"name": "Дейл Купер"})
+        self.assertEqual(self.cache.get("agent"), {"name": "Дейл Купер"})
+        self.assertTrue(self.cache.delete("agent"))
+        self.assertIsNone(self.cache.get("agent"))
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.cache.add("owls", 1))
+        self.assertFalse(self.cache.add("owls", 5))
+        self.assertEqual(self.cache.incr("owls", 2), 3)
+        self.assertEqual(self.cache.get("owls"), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_expired_value_is_gone(self):
+        self.cache.set("pie", "cherry", timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get("pie"))
+
+    def test_write_in_other_process_reaches_local_tier(self):
+        self.cache.set("log", "Лесопилка")
+        self.assertEqual(self.cache.get("log"), "Лесопилка")
+        self.run_in_child(_write_in_child, "log", "Бревно")
+        self.assertEqual(self.cache.get("log"), "Бревно")
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set("visits", 0)
+        processes = [
+            multiprocessing.get_context("fork").Process(
+                target=_incr_in_child, args=(self.location, "visits", 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get("visits"), 200)
+
+    def test_oversized_value_replaces_nothing(self):
+        cache = self.make_cache(SLOTS=16, SLOT_SIZE=256)
+        cache.set("letter", "короткое письмо")
+        self.assertFalse(cache.set("letter", os.urandom(1024)))
+        self.assertIsNone(cache.get("letter"))
+
+    def test_least_recently_read_slot_is_evicted(self):
+        cache = self.make_cache(SLOTS=8, SLOT_SIZE=256)
+        for number in range(8):
+            cache.set(f"suspect-{number}", number)
+        for number in range(1, 8):
+            cache.get(f"suspect-{number}")
+        cache.set("killer", "Боб")
+        self.assertIsNone(cache.get("suspect-0"))
+        self.assertEqual(cache.get("killer"), "Боб")
+        self.assertEqual(cache.get("suspect-7"), 7)
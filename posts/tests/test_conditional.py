@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="F.Mulder")
+        cls.reader = User.objects.create_user(username="D.Scully")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(text="Истина где-то рядом",
+                                       author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.post_url = reverse("post", kwargs={"username": self.author,
+                                                "post_id": self.post.id})
+
+    def test_unchanged_pages_answer_not_modified(self):
+        pages = {
+            reverse("index"): self.guest_client,
+            reverse("profile", kwargs={"username": self.author}):
+                self.guest_client,
+            self.post_url: self.guest_client,
+            reverse("follow_index"): self.reader_client,
+        }
+        for url, client in pages.items():
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                response = client.get(
+                    url, HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b"")
+
+    def test_post_page_changes_etag_after_comment(self):
+        response = self.guest_client.get(self.post_url)
+        etag = response["ETag"]
+        # Дата изменения не видит удалённых комментариев и переноса
+        # отметок, поэтому страница записи её не отдаёт.
+        self.assertFalse(response.has_header("Last-Modified"))
+
+        Comment.objects.create(text="Я хочу верить", post=self.post,
+                               author=self.reader)
+        response = self.guest_client.get(
+            self.post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, "Я хочу верить")
+
+    def test_follow_feed_changes_etag_after_new_post(self):
+        url = reverse("follow_index")
+        etag = self.reader_client.get(url)["ETag"]
+        Post.objects.create(text="Не верь никому", author=self.author)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_viewer(self):
+        url = reverse("index")
+        guest_etag = self.guest_client.get(url)["ETag"]
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=guest_etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
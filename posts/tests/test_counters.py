@@ -0,0 +1,135 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="T.Soprano")
+        cls.reader = User.objects.create_user(username="C.Moltisanti")
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        reader = User.objects.create_user(username="P.Gualtieri")
+        post = Post.objects.create(text="Woke up this morning",
+                                   author=self.author)
+        Comment.objects.create(text="Got yourself a gun", post=post,
+                               author=reader)
+        Follow.objects.create(user=reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(reader).following_count, 1)
+
+        reader.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        post = Post.objects.create(text="Bada bing", author=self.author)
+        Comment.objects.create(text="!", post=post, author=self.reader)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        call_command("reconcile_counters", batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_pages_read_counts_without_aggregates(self):
+        post = Post.objects.create(text="Forget about it",
+                                   author=self.author)
+        Comment.objects.create(text="!", post=post, author=self.reader)
+        urls = (
+            reverse("profile", kwargs={"username": self.author}),
+            reverse("post", kwargs={"username": self.author,
+                                    "post_id": post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = Client().get(url)
+                self.assertContains(response, "Записей: 1")
+                aggregates = [query["sql"] for query in queries
+                              if "COUNT(" in query["sql"]]
+                self.assertEqual(aggregates, [])
+
+
+class GroupDirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="J.Snow")
+        cls.groups = [Group.objects.create(title=title, slug=slug)
+                      for title, slug in (("Дозор", "watch"),
+                                          ("Старки", "starks"),
+                                          ("Ланнистеры", "lannisters"))]
+
+    def setUp(self):
+        cache.clear()
+
+    def group(self, group):
+        return Group.objects.get(pk=group.pk)
+
+    def test_stats_follow_posts(self):
+        watch, starks, _ = self.groups
+        first = Post.objects.create(text="Зима близко", author=self.author,
+                                    group=watch)
+        second = Post.objects.create(text="Я ничего не знаю",
+                                     author=self.author, group=watch)
+        self.assertEqual(self.group(watch).posts_count, 2)
+        self.assertEqual(self.group(watch).last_post, second)
+
+        second.group = starks
+        second.save()
+        self.assertEqual(self.group(watch).posts_count, 1)
+        self.assertEqual(self.group(watch).last_post, first)
+        self.assertEqual(self.group(starks).last_post, second)
+
+        first.delete()
+        self.assertEqual(self.group(watch).posts_count, 0)
+        self.assertIsNone(self.group(watch).last_post)
+
+    def test_reconcile_counters_fixes_groups(self):
+        post = Post.objects.create(text="Ночь темна", author=self.author,
+                                   group=self.groups[0])
+        Group.objects.update(posts_count=9, last_post=None)
+        call_command("reconcile_counters", stdout=StringIO())
+        self.assertEqual(self.group(self.groups[0]).posts_count, 1)
+        self.assertEqual(self.group(self.groups[0]).last_post, post)
+        self.assertEqual(self.group(self.groups[1]).posts_count, 0)
+
+    def test_directory_is_one_query_in_title_order(self):
+        Post.objects.create(text="Ланнистеры платят долги",
+                            author=self.author, group=self.groups[2])
+        url = reverse("group_index")
+        with self.assertNumQueries(1):
+            response = Client().get(url)
+        self.assertEqual(list(response.context["page"]),
+                         sorted(self.groups, key=lambda group: group.title))
+        self.assertContains(response, "Ланнистеры платят долги")
+        self.assertContains(response, "Записей: 1")
+
+    def test_card_is_invalidated_with_its_group(self):
+        url = reverse("group_index")
+        Client().get(url)
+        Post.objects.create(text="Пёс", author=self.author,
+                            group=self.groups[1])
+        response = Client().get(url)
+        self.assertContains(response, "Пёс")
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import events
+from posts.models import Follow, Post
+from yatube.asgi import application
+
+User = get_user_model()
+
+
+class Connection:
+    """Клиент ASGI: запрос без тела, ответ копится в ``messages``."""
+
+    def __init__(self, path, query=b"", cookie=None):
+        self.scope = {"type": "http", "method": "GET", "path": path,
+                      "query_string": query, "headers": []}
+        if cookie:
+            self.scope["headers"].append((b"cookie", cookie.encode()))
+        self.requests = asyncio.Queue()
+        self.requests.put_nowait({"type": "http.request", "body": b""})
+        self.messages = []
+        self.received = asyncio.Event()
+        self.read = 0
+
+    async def receive(self):
+        return await self.requests.get()
+
+    async def send(self, message):
+        self.messages.append(message)
+        self.received.set()
+
+    async def next_body(self):
+        while True:
+            bodies = [message["body"] for message in self.messages
+                      if message["type"] == "http.response.body"]
+            if len(bodies) > self.read:
+                self.read += 1
+                return bodies[self.read - 1]
+            self.received.clear()
+            await asyncio.wait_for(self.received.wait(), 5)
+
+    def start(self):
+        return asyncio.ensure_future(
+            application(self.scope, self.receive, self.send))
+
+    def disconnect(self):
+        self.requests.put_nowait({"type": "http.disconnect"})
+
+    @property
+    def status(self):
+        return self.messages[0]["status"]
+
+
+@override_settings(EVENTS_URL="/events/")
+class EventStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="B.Draper")
+        self.reader = User.objects.create_user(username="P.Olson")
+        self.stranger = User.objects.create_user(username="P.Campbell")
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.post = Post.objects.create(text="Это не ложь, если ты в неё "
+                                             "веришь", author=self.author)
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        key = client.cookies[settings.SESSION_COOKIE_NAME].value
+        return f"{settings.SESSION_COOKIE_NAME}={key}"
+
+    def test_publish_reaches_index_and_connected_followers(self):
+        async def scenario():
+            index = events.subscribe(events.INDEX)
+            reader = events.subscribe(events.follow(self.reader.pk),
+                                      self.reader.pk)
+            stranger = events.subscribe(events.follow(self.stranger.pk),
+                                        self.stranger.pk)
+            loop = asyncio.get_running_loop()
+            for _ in range(2):
+                await loop.run_in_executor(None, events.publish_post,
+                                           self.post)
+            await asyncio.sleep(0)
+            for subscription in (index, reader, stranger):
+                events.unsubscribe(subscription)
+            return index.count, reader.count, stranger.count
+
+        self.assertEqual(asyncio.run(scenario()), (2, 2, 0))
+        self.assertEqual(events.listeners(), set())
+
+    def test_follow_stream_counts_new_posts(self):
+        async def scenario():
+            connection = Connection(settings.EVENTS_URL, b"feed=follow",
+                                    self.session_cookie(self.reader))
+            task = connection.start()
+            self.assertEqual(await connection.next_body(),
+                             b"retry: 10000\n\n")
+            thread = threading.Thread(target=events.publish_post,
+                                      args=(self.post,))
+            thread.start()
+            thread.join()
+            event = await connection.next_body()
+            connection.disconnect()
+            await asyncio.wait_for(task, 5)
+            return connection.status, event
+
+        status, event = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertTrue(event.startswith(b"event: new-posts\n"))
+        data = event.decode().split("data: ", 1)[1]
+        self.assertEqual(json.loads(data), {"count": 1})
+
+    def test_follow_stream_requires_login(self):
+        async def scenario():
+            connection = Connection(settings.EVENTS_URL, b"feed=follow")
+            await connection.start()
+            return connection.status
+
+        self.assertEqual(asyncio.run(scenario()), 401)
+
+    def test_repeated_cookie_headers_keep_the_session(self):
+        async def scenario():
+            connection = Connection(reverse("follow_index"),
+                                    cookie="theme=dark")
+            connection.scope["headers"].append(
+                (b"cookie", self.session_cookie(self.reader).encode()))
+            await connection.start()
+            return connection.status
+
+        self.assertEqual(asyncio.run(scenario()), 200)
+
+    @override_settings(EVENTS_KEEPALIVE=0.01)
+    def test_idle_stream_sends_keepalive(self):
+        async def scenario():
+            connection = Connection(settings.EVENTS_URL)
+            task = connection.start()
+            await connection.next_body()
+            keepalive = await connection.next_body()
+            connection.disconnect()
+            await asyncio.wait_for(task, 5)
+            return keepalive
+
+        self.assertEqual(asyncio.run(scenario()), b": keepalive\n\n")
+
+    def test_other_paths_are_served_by_django(self):
+        async def scenario():
+            connection = Connection(reverse("index"))
+            await connection.start()
+            return connection.status, connection.messages[1]["body"]
+
+        status, body = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertIn(self.post.text.encode(), body)
+
+    def test_new_post_publishes_after_commit(self):
+        client = Client()
+        client.force_login(self.author)
+
+        async def scenario():
+            index = events.subscribe(events.INDEX)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: client.post(
+                reverse("new_post"), {"text": "Новая кампания"}))
+            await asyncio.sleep(0)
+            events.unsubscribe(index)
+            return index.count
+
+        self.assertEqual(asyncio.run(scenario()), 1)
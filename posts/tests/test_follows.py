@@ -0,0 +1,172 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Follow, Post, Timeline, UserStats
+from yatube.settings import FOLLOWS_PER_PAGE
+
+User = get_user_model()
+
+
+class FollowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username="L.Knope")
+        cls.authors = [User.objects.create_user(username=name)
+                       for name in ("R.Swanson", "A.Dwyer", "A.Ludgate")]
+        cls.post = Post.objects.create(text="Завтрак на ужин",
+                                       author=cls.authors[0])
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def first_follow_query(self, captured):
+        """Первый запрос к подпискам: запись должна идти без проверки."""
+        return next(query["sql"] for query in captured.captured_queries
+                    if "posts_follow" in query["sql"].split(" WHERE")[0])
+
+    def test_repeated_follow_is_ignored(self):
+        author = self.authors[0].username
+        url = reverse("profile_follow", kwargs={"username": author})
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(url)
+            self.assertTrue(
+                self.first_follow_query(captured).startswith("INSERT"))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertTrue(Timeline.objects.filter(user=self.reader,
+                                                post=self.post).exists())
+
+    def test_unfollow_is_a_single_delete(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        url = reverse("profile_unfollow",
+                      kwargs={"username": self.authors[0].username})
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(url)
+        self.assertTrue(
+            self.first_follow_query(captured).startswith("DELETE"))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    def test_self_and_unknown_usernames_are_skipped(self):
+        created = follows.follow(self.reader, [self.reader.username,
+                                               "J.Gergich"])
+        self.assertEqual(created, [])
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unknown_author_is_not_found(self):
+        for name in ("profile_follow", "profile_unfollow"):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(name, kwargs={"username": "J.Gergich"}))
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse(
+            "profile_follow", kwargs={"username": self.reader.username}))
+        self.assertRedirects(response, reverse(
+            "profile", kwargs={"username": self.reader.username}))
+
+    def test_bulk_endpoint_follows_and_unfollows_in_one_request(self):
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        names = [author.username for author in self.authors]
+        response = self.client.post(
+            reverse("api:follow_status"),
+            json.dumps({"follow": names[:2], "unfollow": names[2:]}),
+            content_type="application/json")
+        self.assertEqual(response.json(), {names[0]: True, names[1]: True,
+                                           names[2]: False})
+        self.assertEqual(self.stats(self.reader).following_count, 2)
+
+    def test_status_lookup_is_one_query(self):
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        names = [author.username for author in self.authors]
+        with self.assertNumQueries(1):
+            statuses = follows.statuses(self.reader, names)
+        self.assertEqual(statuses, {names[0]: False, names[1]: True,
+                                    names[2]: False})
+        response = self.client.get(reverse("api:follow_status"),
+                                   {"usernames": ",".join(names)})
+        self.assertEqual(response.json(), statuses)
+
+    def test_bulk_endpoint_rejects_bad_input(self):
+        url = reverse("api:follow_status")
+        for body in ('{"follow": "R.Swanson"}', "[]", "не json"):
+            with self.subTest(body=body):
+                response = self.client.post(url, body,
+                                            content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(Client().get(url).status_code, 401)
+
+
+class FollowListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="B.Wyatt")
+        cls.viewer = User.objects.create_user(username="C.Traeger")
+        User.objects.bulk_create(
+            User(username=f"Fan{number:02}")
+            for number in range(FOLLOWS_PER_PAGE + 5))
+        cls.fans = list(User.objects.filter(username__startswith="Fan")
+                        .order_by("username"))
+        Follow.objects.bulk_create(
+            Follow(user=fan, author=cls.author) for fan in cls.fans)
+        Follow.objects.bulk_create(
+            Follow(user=cls.author, author=fan) for fan in cls.fans)
+        Follow.objects.create(user=cls.viewer, author=cls.fans[-1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.viewer)
+
+    def walk(self, name):
+        url = reverse(name, kwargs={"username": self.author.username})
+        people, cursor = [], None
+        while True:
+            response = self.client.get(url, {"cursor": cursor} if cursor
+                                       else {})
+            people.extend(response.context["people"])
+            cursor = response.context["page"].next_cursor
+            if cursor is None:
+                return people
+
+    def test_lists_are_newest_first_and_complete(self):
+        expected = list(reversed(self.fans))
+        self.assertEqual(self.walk("followers"), expected)
+        self.assertEqual(self.walk("following"), expected)
+
+    def test_viewer_status_comes_from_one_query(self):
+        url = reverse("followers", kwargs={"username": self.author.username})
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        people = response.context["people"]
+        self.assertEqual(len(people), FOLLOWS_PER_PAGE)
+        self.assertEqual([person.is_followed for person in people[:3]],
+                         [True, False, False])
+        lookups = [query for query in captured.captured_queries
+                   if 'FROM "posts_follow"' in query["sql"]
+                   and '"posts_follow"."author_id" IN' in query["sql"]]
+        self.assertEqual(len(lookups), 1)
+
+    def test_status_follows_viewer_changes(self):
+        url = reverse("followers", kwargs={"username": self.author.username})
+        etag = self.client.get(url)["ETag"]
+        self.client.get(reverse("profile_follow",
+                                kwargs={"username": self.fans[-2].username}))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        people = response.context["people"]
+        self.assertEqual([person.is_followed for person in people[:3]],
+                         [True, True, False])
@@ -1,3 +1,4 @@
+import io
 import shutil
 import tempfile
 
@@ -6,7 +7,9 @@ from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase
 from django.urls import reverse
+from PIL import Image
 
+from posts import images
 from posts.models import Comment, Group, Post
 
 User = get_user_model()
@@ -79,6 +82,30 @@ class FormsTests(TestCase):
         self.assertEqual(new_post.author, self.author)
         self.assertTrue(new_post.image)
 
+    def test_uploaded_images_are_transcoded_and_shared(self):
+        content = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = "Wolfram & Hart"
+        Image.new("RGB", (3000, 1000), (10, 120, 10)).save(
+            content, "JPEG", exif=exif)
+        for number in range(2):
+            self.authorized_client.post(reverse("new_post"), data={
+                "text": f"Один и тот же мем {number}",
+                "image": SimpleUploadedFile("meme.jpg", content.getvalue(),
+                                            content_type="image/jpeg"),
+            })
+        first, second = Post.objects.filter(text__startswith="Один")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^posts/\w\w/\w{64}\.webp$")
+        storage = first.image.storage
+        jpeg = images.fallback_name(first.image.name)
+        self.assertTrue(storage.exists(jpeg))
+        for name in (first.image.name, jpeg):
+            with storage.open(name) as stored, Image.open(stored) as image:
+                self.assertLessEqual(max(image.size),
+                                     max(settings.POST_IMAGE_MAX_SIZE))
+                self.assertEqual(len(image.getexif()), 0)
+
     def test_author_can_edit_post(self):
         self.post = Post.objects.create(
             text="Я не сумасшедший. Моя мамуля меня проверяла.",
@@ -0,0 +1,140 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import likes
+from posts.models import Like, LikeShard, Post
+
+User = get_user_model()
+
+
+class LikeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="S.White")
+        cls.fans = [User.objects.create_user(username=f"Temp{number}")
+                    for number in range(5)]
+        cls.posts = [Post.objects.create(text=f"Кухня {number}",
+                                         author=cls.author)
+                     for number in range(3)]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.fans[0])
+
+    def post_api(self, body, client=None):
+        return (client or self.client).post(
+            reverse("api:like_status"), json.dumps(body),
+            content_type="application/json")
+
+    def test_likes_are_unique_and_counted_from_shards(self):
+        post = self.posts[0]
+        for fan in self.fans:
+            likes.like(fan, [post.pk, post.pk])
+        self.assertEqual(likes.like(self.fans[0], [post.pk]), [])
+        likes.unlike(self.fans[1], [post.pk])
+        self.assertEqual(Like.objects.filter(post=post).count(), 4)
+        self.assertLessEqual(LikeShard.objects.filter(post=post).count(), 8)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 0)
+        self.assertEqual(likes.statuses(self.fans[0], [post.pk]),
+                         {post.pk: {"likes": 4, "liked": True}})
+
+    @override_settings(LIKE_SHARDS=3)
+    def test_flush_moves_shards_into_posts(self):
+        for fan in self.fans:
+            likes.like(fan, [post.pk for post in self.posts])
+        likes.unlike(self.fans[0], [self.posts[2].pk])
+        call_command("flush_likes", batch_size=2, stdout=StringIO())
+        self.assertFalse(LikeShard.objects.exists())
+        counts = dict(Post.objects.values_list("pk", "likes_count"))
+        self.assertEqual([counts[post.pk] for post in self.posts], [5, 5, 4])
+        likes.unlike(self.fans[1], [self.posts[0].pk])
+        self.assertEqual(likes.statuses(self.fans[1], [self.posts[0].pk]),
+                         {self.posts[0].pk: {"likes": 4, "liked": False}})
+
+    def test_flush_refreshes_cached_pages(self):
+        cache.clear()
+        url = reverse("profile", kwargs={"username": self.author.username})
+        guest = Client()
+        guest.get(url)
+        likes.like(self.fans[0], [self.posts[0].pk])
+        response = guest.get(url)
+        self.assertContains(response, "var signedIn = false;")
+        self.assertContains(response, '<span class="js-like-count">0</span>',
+                            count=3)
+        likes.flush()
+        response = guest.get(url)
+        self.assertContains(response, '<span class="js-like-count">1</span>',
+                            count=1)
+
+    def test_deleted_fan_takes_likes_away(self):
+        post = self.posts[0]
+        fan = User.objects.create_user(username="W.Junior")
+        likes.like(fan, [post.pk])
+        likes.like(self.fans[0], [post.pk])
+        own = Post.objects.create(text="Свой рецепт", author=fan)
+        likes.like(fan, [own.pk])
+        likes.flush()
+        likes.like(self.fans[1], [post.pk])
+        fan.delete()
+        self.assertEqual(likes.statuses(self.fans[0], [post.pk]),
+                         {post.pk: {"likes": 2, "liked": True}})
+        likes.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 2)
+
+    def test_page_statuses_are_one_query(self):
+        likes.like(self.fans[0], [self.posts[1].pk])
+        likes.like(self.fans[1], [self.posts[1].pk, self.posts[2].pk])
+        with self.assertNumQueries(1):
+            statuses = likes.statuses(
+                self.fans[0], [post.pk for post in self.posts])
+        self.assertEqual(statuses, {
+            self.posts[0].pk: {"likes": 0, "liked": False},
+            self.posts[1].pk: {"likes": 2, "liked": True},
+            self.posts[2].pk: {"likes": 1, "liked": False},
+        })
+
+    def test_api_likes_and_unlikes(self):
+        first, second = self.posts[0].pk, self.posts[1].pk
+        likes.like(self.fans[0], [second])
+        response = self.post_api({"like": [first], "unlike": [second]})
+        self.assertEqual(response.json(), {
+            str(first): {"likes": 1, "liked": True},
+            str(second): {"likes": 0, "liked": False},
+        })
+        response = Client().get(reverse("api:like_status"),
+                                {"posts": f"{first},{second}"})
+        self.assertEqual(response.json()[str(first)],
+                         {"likes": 1, "liked": False})
+
+    def test_api_rejects_bad_input(self):
+        for body in ({"like": "1"}, {"like": [True]}, []):
+            with self.subTest(body=body):
+                self.assertEqual(self.post_api(body).status_code, 400)
+        self.assertEqual(self.post_api({"like": [1]}, Client()).status_code,
+                         401)
+        response = self.client.get(reverse("api:like_status"),
+                                   {"posts": "1,два"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reconcile_counters_recounts_likes(self):
+        likes.like(self.fans[0], [self.posts[0].pk])
+        Post.objects.filter(pk=self.posts[0].pk).update(likes_count=7)
+        call_command("reconcile_counters", stdout=StringIO())
+        self.assertFalse(LikeShard.objects.exists())
+        self.assertEqual(likes.statuses(self.fans[0], [self.posts[0].pk]),
+                         {self.posts[0].pk: {"likes": 1, "liked": True}})
+
+    def test_post_page_shows_like_button(self):
+        post = self.posts[0]
+        response = self.client.get(reverse("post", kwargs={
+            "username": self.author.username, "post_id": post.pk}))
+        self.assertContains(response, f'data-post="{post.pk}"')
+        self.assertContains(response, reverse("api:like_status"))
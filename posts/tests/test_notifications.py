@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows, notifications
+from posts.models import Follow, Notification, Post
+from yatube.settings import NOTIFICATIONS_PER_PAGE, UNREAD_LIMIT
+
+User = get_user_model()
+
+
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="D.Scully")
+        cls.fans = [User.objects.create_user(username=name)
+                    for name in ("F.Mulder", "W.Skinner", "J.Byers")]
+        cls.post = Post.objects.create(text="Истина где-то рядом",
+                                       author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def comment(self, user, post=None):
+        client = Client()
+        client.force_login(user)
+        post = post or self.post
+        client.post(reverse("add_comment", kwargs={
+            "username": post.author.username, "post_id": post.id}),
+            {"text": "Я хочу верить"})
+
+    def test_comments_coalesce_until_seen(self):
+        for fan in self.fans + [self.fans[0]]:
+            self.comment(fan)
+        self.comment(self.author)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.kind, Notification.COMMENT)
+        self.assertEqual(notification.events_count, 4)
+        self.assertEqual(notification.actor, self.fans[0])
+
+        response = self.client.get(reverse("notifications"))
+        self.assertContains(response, "Комментариев к записи")
+        self.assertTrue(Notification.objects.get().seen)
+        self.comment(self.fans[1])
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_bulk_follow_is_one_write(self):
+        other = User.objects.create_user(username="A.Skinner")
+        with self.assertNumQueries(1):
+            notifications.followed([
+                Follow(user=self.fans[0], author=author)
+                for author in (self.author, other, self.author)])
+        rows = dict(Notification.objects.values_list("recipient_id",
+                                                     "events_count"))
+        self.assertEqual(rows, {self.author.pk: 2, other.pk: 1})
+
+    def test_profile_follow_notifies_the_author(self):
+        client = Client()
+        client.force_login(self.fans[2])
+        client.get(reverse("profile_follow",
+                           kwargs={"username": self.author.username}))
+        follows.follow(self.fans[1], [self.author.username])
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.kind, Notification.FOLLOW)
+        self.assertEqual(notification.events_count, 2)
+        self.assertEqual(notification.actor, self.fans[1])
+
+    def test_badge_is_cached_and_invalidated(self):
+        url = reverse("group_index")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            notifications.unread_count(self.author)
+        self.comment(self.fans[0])
+        other = Post.objects.create(text="Пришельцы", author=self.author)
+        self.comment(self.fans[0], other)
+        response = self.client.get(url)
+        self.assertContains(response, '<span class="badge badge-danger">2')
+        self.client.get(reverse("notifications"))
+        response = self.client.get(url)
+        self.assertNotContains(response, "badge-danger")
+
+    def test_badge_is_capped(self):
+        Post.objects.bulk_create(
+            Post(text=f"Секретные материалы {number}", author=self.author)
+            for number in range(UNREAD_LIMIT + 5))
+        Notification.objects.bulk_create(
+            Notification(recipient=self.author, actor=self.fans[0],
+                         kind=Notification.COMMENT, post=post)
+            for post in Post.objects.filter(text__startswith="Секретные"))
+        self.assertEqual(notifications.unread_count(self.author),
+                         UNREAD_LIMIT + 1)
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, f"{UNREAD_LIMIT}+")
+
+    def test_inbox_is_paginated_newest_first(self):
+        Post.objects.bulk_create(
+            Post(text=f"Дело {number}", author=self.author)
+            for number in range(NOTIFICATIONS_PER_PAGE + 3))
+        posts = list(Post.objects.filter(text__startswith="Дело")
+                     .order_by("id"))
+        for post in posts:
+            notifications._write(Notification.COMMENT,
+                                 [(self.author.pk, post.pk,
+                                   self.fans[0].pk)])
+        seen, url = [], reverse("notifications")
+        while url:
+            page = self.client.get(url).context["page"]
+            seen.extend(notification.post_id for notification in page)
+            url = page.has_next() and (
+                reverse("notifications") + f"?cursor={page.next_cursor}")
+        self.assertEqual(seen, [post.pk for post in reversed(posts)])
@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import Page
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.pagination import CursorPage, CursorPaginator
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="D.Cooper")
+        cls.group = Group.objects.create(
+            title="Твин Пикс",
+            slug="twin-peaks",
+        )
+        Post.objects.bulk_create(
+            Post(text=f"Запись {number}", author=cls.author, group=cls.group)
+            for number in range(POSTS_PER_PAGE * 2 + 5)
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_cursor_walks_whole_feed_in_order(self):
+        expected = list(
+            Post.objects.order_by("-pub_date", "-id")
+            .values_list("id", flat=True)
+        )
+        paginator = CursorPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        seen = []
+        page = paginator.get_page(None)
+        while True:
+            seen.extend(post.id for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = CursorPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertFalse(first.has_previous())
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in first])
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        paginator = CursorPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        first = paginator.get_page(None)
+        broken = paginator.get_page("not-a-cursor")
+        self.assertEqual([post.id for post in broken],
+                         [post.id for post in first])
+
+    def test_cursor_with_empty_keys_falls_back_to_first_page(self):
+        # base64 от [false, null, null]
+        cursor = "W2ZhbHNlLG51bGwsbnVsbF0"
+        paginator = CursorPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        self.assertIsNone(paginator.decode(cursor))
+        for url in (reverse("index"), reverse("index_more"),
+                    reverse("api:index")):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 200)
+
+    def test_numbered_page_links_into_cursor_mode(self):
+        response = self.guest_client.get(reverse("index") + "?page=2")
+        page = response.context["page"]
+        self.assertIsInstance(page, Page)
+        self.assertEqual(page.number, 2)
+        response = self.guest_client.get(
+            reverse("index") + f"?cursor={page.next_cursor}")
+        cursor_page = response.context["page"]
+        self.assertIsInstance(cursor_page, CursorPage)
+        self.assertEqual(len(cursor_page), 5)
+        self.assertFalse(cursor_page.has_next())
+
+    def test_first_page_is_read_by_cursor_without_count(self):
+        urls = (reverse("index"),
+                reverse("group", kwargs={"slug": self.group.slug}),
+                reverse("profile", kwargs={"username": self.author}))
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.guest_client.get(url)
+                self.assertFalse([query["sql"]
+                                  for query in captured.captured_queries
+                                  if "COUNT(" in query["sql"]])
+                page = response.context["page"]
+                self.assertIsInstance(page, Page)
+                self.assertEqual(len(page), POSTS_PER_PAGE)
+                self.assertTrue(page.has_next())
+                self.assertContains(response, f"?cursor={page.next_cursor}")
+                self.assertNotContains(response, "?page=2")
+
+    def test_load_more_fragments(self):
+        urls = {
+            reverse("index_more"): "inclusions/feed_item.html",
+            reverse("group_more", kwargs={"slug": self.group.slug}):
+                "inclusions/feed_item.html",
+            reverse("profile_more", kwargs={"username": self.author}):
+                "inclusions/post_item.html",
+        }
+        for url, item_template in urls.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTemplateUsed(response, "inclusions/feed_more.html")
+                self.assertTemplateUsed(response, item_template)
+                self.assertEqual(len(response.context["page"]),
+                                 POSTS_PER_PAGE)
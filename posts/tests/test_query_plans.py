@@ -0,0 +1,206 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+# Строка плана: «SCAN/SEARCH таблица ...»; таблица может быть указана
+# псевдонимом соединения вроде T4.
+PLAN_ROW = re.compile(r"^(SCAN|SEARCH) (\S+)(.*)$")
+ALIAS = re.compile(r'"(\w+)" (T\d+)\b')
+TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+# Маленькие справочники, которые целиком выводятся списком выбора.
+SMALL_TABLES = ("django_content_type", "auth_permission", "posts_group")
+# Большие таблицы нельзя обходить и целиком по покрывающему индексу:
+# так выглядит, например, COUNT(*) по всей ленте.
+LARGE_TABLES = ("posts_post", "posts_timeline", "posts_comment")
+# Релевантность bm25 считается по всем совпадениям, так что сортировка
+# результатов поиска неизбежна и ограничена числом совпадений.
+RANKED_TABLES = ("posts_search",)
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql, small_tables=SMALL_TABLES):
+    """Строки плана ``sql`` с полным обходом таблицы или сортировкой.
+
+    Исключения решаются по таблице из самой строки плана, а не по
+    тексту запроса.
+    """
+    aliases = dict((alias, table) for table, alias in ALIAS.findall(sql))
+    rows = []
+    for line in explain(sql, ()):
+        match = PLAN_ROW.match(line)
+        if match:
+            action, table, rest = match.groups()
+            rows.append((line, action, aliases.get(table, table), rest))
+        else:
+            rows.append((line, None, None, line))
+    ranked = any(table in RANKED_TABLES for _, _, table, _ in rows)
+    problems = []
+    for line, action, table, rest in rows:
+        if action == "SCAN" and table not in small_tables:
+            walk = rest.strip().startswith("USING COVERING INDEX")
+            if not rest.strip() or walk and table in LARGE_TABLES:
+                problems.append(line)
+        elif TEMP_SORT.search(line) and not ranked:
+            problems.append(line)
+    return problems
+
+
+class QueryPlanTests(TestCase):
+    """Каждый запрос каждой страницы идёт по индексу и без сортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="T.Soprano")
+        cls.reader = User.objects.create_user(username="C.Moltisanti")
+        cls.group = Group.objects.create(title="Клан Сопрано",
+                                         slug="sopranos")
+        Post.objects.bulk_create(
+            Post(text=f"Запись {number}", author=cls.author, group=cls.group)
+            for number in range(POSTS_PER_PAGE * 3)
+        )
+        cls.post = Post.objects.create(text="Габагул", author=cls.author,
+                                       group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text="Отличное мясо")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_plans_use_indexes(self, url, method="get", data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400, url)
+        problems = []
+        for query in captured.captured_queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            problems.extend(f"{line}\n    {sql}"
+                            for line in plan_problems(sql))
+        self.assertFalse(problems, f"{url}:\n" + "\n".join(problems))
+        return response
+
+    def cursor_of(self, url):
+        response = self.client.get(url)
+        return response.context["page"].next_cursor
+
+    def test_feed_pages(self):
+        profile = reverse("profile", kwargs={"username": self.author})
+        group = reverse("group", kwargs={"slug": self.group.slug})
+        for url in (reverse("index"), group, profile,
+                    reverse("follow_index")):
+            with self.subTest(url=url):
+                self.assert_plans_use_indexes(url)
+                cursor = self.cursor_of(url)
+                self.assert_plans_use_indexes(f"{url}?cursor={cursor}")
+        # Старые ссылки с номером страницы без COUNT(*) только там, где
+        # число записей хранится.
+        for url in (group, profile):
+            with self.subTest(url=url):
+                self.assert_plans_use_indexes(url + "?page=2")
+
+    def test_follow_feed_with_popular_author(self):
+        Follow.objects.filter(user=self.reader).update(pull=True)
+        url = reverse("follow_index")
+        self.assert_plans_use_indexes(url)
+        cursor = self.cursor_of(url)
+        self.assert_plans_use_indexes(f"{url}?cursor={cursor}")
+
+    def test_load_more_fragments(self):
+        profile = reverse("profile_more", kwargs={"username": self.author})
+        group = reverse("group_more", kwargs={"slug": self.group.slug})
+        for url in (reverse("index_more"), group, profile,
+                    reverse("follow_more")):
+            with self.subTest(url=url):
+                self.assert_plans_use_indexes(url)
+
+    def test_post_pages(self):
+        kwargs = {"username": self.author.username, "post_id": self.post.id}
+        for name in ("post", "comments_more", "add_comment"):
+            with self.subTest(name=name):
+                self.assert_plans_use_indexes(reverse(name, kwargs=kwargs))
+        self.assert_plans_use_indexes(reverse("add_comment", kwargs=kwargs),
+                                      "post", {"text": "Бада-бинг"})
+
+    def test_author_pages(self):
+        self.client.force_login(self.author)
+        post = {"username": self.author.username, "post_id": self.post.id}
+        self.assert_plans_use_indexes(reverse("new_post"))
+        self.assert_plans_use_indexes(reverse("post_edit", kwargs=post))
+
+    def test_follow_actions(self):
+        author = {"username": self.author.username}
+        self.assert_plans_use_indexes(
+            reverse("profile_unfollow", kwargs=author))
+        self.assert_plans_use_indexes(
+            reverse("profile_follow", kwargs=author))
+
+    def test_follow_lists(self):
+        author = {"username": self.author.username}
+        for name in ("followers", "following"):
+            with self.subTest(name=name):
+                self.assert_plans_use_indexes(reverse(name, kwargs=author))
+
+    def test_group_directory(self):
+        # Группы здесь не справочник: каталог листает их все.
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse("group_index"))
+        for query in captured.captured_queries:
+            self.assertFalse(plan_problems(query["sql"], small_tables=()),
+                             query["sql"])
+
+    def test_notifications(self):
+        self.client.post(reverse("add_comment", kwargs={
+            "username": self.author.username, "post_id": self.post.id}),
+            {"text": "Босс"})
+        self.client.force_login(self.author)
+        self.assert_plans_use_indexes(reverse("group_index"))
+        self.assert_plans_use_indexes(reverse("notifications"))
+
+    def test_likes(self):
+        url = reverse("api:like_status")
+        self.client.post(url, f'{{"like": [{self.post.id}]}}',
+                         content_type="application/json")
+        self.assert_plans_use_indexes(url, data={"posts": self.post.id})
+
+    def test_trending(self):
+        for url in (reverse("trending"), reverse("trending_groups")):
+            with self.subTest(url=url):
+                self.assert_plans_use_indexes(url)
+
+    def test_search(self):
+        self.assert_plans_use_indexes(reverse("search"), data={"q": "Запись"})
+
+    def test_api(self):
+        author = {"username": self.author.username}
+        post = {"username": self.author.username, "post_id": self.post.id}
+        for url in (reverse("api:index"),
+                    reverse("api:follow_index"),
+                    reverse("api:group", kwargs={"slug": self.group.slug}),
+                    reverse("api:profile", kwargs=author),
+                    reverse("api:profile_posts", kwargs=author),
+                    reverse("api:post", kwargs=post),
+                    reverse("api:comments", kwargs=post)):
+            with self.subTest(url=url):
+                data = self.assert_plans_use_indexes(url).json()
+                if data.get("next"):
+                    self.assert_plans_use_indexes(url, data={
+                        "cursor": data["next"]})
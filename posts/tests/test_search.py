@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="F.Mulder")
+        cls.admin = User.objects.create_superuser(
+            username="W.Skinner", email="skinner@fbi.gov", password="x")
+        cls.truth = Post.objects.create(
+            text="Истина где-то рядом, и пришельцы тоже",
+            author=cls.author,
+        )
+        cls.trust = Post.objects.create(
+            text="Не верь никому <script>alert(1)</script>",
+            author=cls.author,
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.trust,
+            author=cls.author,
+            text="Курильщик знает про пришельцев больше всех",
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_posts_and_comments_are_found_with_snippets(self):
+        response = self.guest_client.get(reverse("search"),
+                                         {"q": "пришельц"})
+        hits = list(response.context["page"])
+        self.assertEqual({(hit.post, hit.comment) for hit in hits},
+                         {(self.truth, None), (self.trust, self.comment)})
+        self.assertContains(response, "<mark>пришельцы</mark>")
+
+    def test_snippet_is_escaped(self):
+        response = self.guest_client.get(reverse("search"), {"q": "верь"})
+        self.assertContains(response, "&lt;script&gt;")
+        self.assertNotContains(response, "<script>alert")
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.get(pk=self.truth.pk)
+        post.text = "Я хочу верить"
+        post.save()
+        self.assertEqual(len(search.search("Истина")), 0)
+        self.assertEqual([hit.post for hit in search.search("хочу")], [post])
+        post.delete()
+        self.assertEqual(len(search.search("хочу")), 0)
+        self.assertEqual(len(search.search("пришельцев")), 1)
+
+    def test_cursor_walks_all_results_once(self):
+        Post.objects.bulk_create(
+            Post(text=f"Дело номер {number}: снова пришельцы",
+                 author=self.author)
+            for number in range(25)
+        )
+        call_command("rebuild_search_index", batch_size=7,
+                     stdout=StringIO())
+        seen = []
+        page = search.search("пришельцы", per_page=10)
+        while True:
+            seen.extend((hit.post.pk, hit.comment) for hit in page)
+            if not page.has_next():
+                break
+            page = search.search("пришельцы", page.next_cursor, 10)
+        self.assertEqual(len(seen), 26)
+        self.assertEqual(len(set(seen)), 26)
+
+    def test_query_syntax_never_breaks_search(self):
+        for query in ('"', "AND OR NOT", "(*)", "", "NEAR(", "-:^"):
+            with self.subTest(query=query):
+                response = self.guest_client.get(reverse("search"),
+                                                 {"q": query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_full_text_index(self):
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(reverse("admin:posts_post_changelist"),
+                              {"q": "рядом"})
+        self.assertEqual(list(response.context["cl"].result_list),
+                         [self.truth])
+        response = client.get(reverse("admin:posts_comment_changelist"),
+                              {"q": "курильщик"})
+        self.assertEqual(list(response.context["cl"].result_list),
+                         [self.comment])
@@ -0,0 +1,117 @@
+import random
+from collections import Counter, defaultdict
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, FollowChange, Suggestion
+
+User = get_user_model()
+
+
+def reference_scores(edges, user, weight, fanout):
+    """Те же оценки, посчитанные в лоб по словарям."""
+    following, followers = defaultdict(set), defaultdict(set)
+    for follower, author in edges:
+        following[follower].add(author)
+        followers[author].add(follower)
+    scores = Counter()
+    for author in following[user]:
+        for candidate in following[author]:
+            scores[candidate] += 1
+        if len(followers[author]) > fanout:
+            continue
+        for similar in followers[author] - {user}:
+            for candidate in following[similar]:
+                scores[candidate] += weight / len(followers[author])
+    for known in following[user] | {user}:
+        scores.pop(known, None)
+    return scores
+
+
+@override_settings(SUGGESTIONS_COUNT=100, SUGGESTIONS_MAX_FANOUT=6,
+                   SUGGESTIONS_COFOLLOW_WEIGHT=0.5)
+class SuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        names = ["M.Scott", "D.Schrute", "J.Halpert", "P.Beesly",
+                 "R.Howard", "T.Flenderson", "A.Martin", "K.Malone"]
+        cls.users = [User.objects.create_user(username=name)
+                     for name in names]
+        cls.users += [User.objects.create_user(username=f"Temp{n}")
+                      for n in range(22)]
+        generator = random.Random(2005)
+        pairs = {(generator.choice(cls.users), generator.choice(cls.users))
+                 for _ in range(150)}
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author)
+            for user, author in pairs if user != author)
+        cls.edges = list(Follow.objects.values_list("user_id", "author_id"))
+
+    def suggested(self, user):
+        return {row.author_id: row.score
+                for row in Suggestion.objects.filter(user=user)}
+
+    def test_scores_match_reference(self):
+        suggestions.rebuild(full=True)
+        for user in self.users:
+            with self.subTest(user=user):
+                expected = reference_scores(self.edges, user.pk, 0.5, 6)
+                actual = self.suggested(user)
+                self.assertEqual(set(actual), set(expected))
+                for author_id, value in expected.items():
+                    self.assertAlmostEqual(actual[author_id], value)
+
+    @override_settings(SUGGESTIONS_COUNT=3)
+    def test_only_top_k_are_stored_in_rank_order(self):
+        suggestions.rebuild(full=True)
+        for user in self.users:
+            rows = list(Suggestion.objects.filter(user=user))
+            self.assertLessEqual(len(rows), 3)
+            self.assertEqual([row.rank for row in rows],
+                             list(range(len(rows))))
+            scores = [row.score for row in rows]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_incremental_rebuild_touches_affected_readers_only(self):
+        suggestions.rebuild(full=True)
+        FollowChange.objects.all().delete()
+        reader = User.objects.create_user(username="H.Flax")
+        bystanders = set(User.objects.exclude(
+            pk__in=[reader.pk, self.users[0].pk]).exclude(
+            following__user=reader).exclude(
+            follower__author=self.users[0]).values_list("pk", flat=True))
+        before = dict(Suggestion.objects.filter(
+            user__in=bystanders).values_list("pk", "user_id"))
+        Follow.objects.create(user=reader, author=self.users[0])
+        self.assertEqual(FollowChange.objects.count(), 1)
+
+        suggestions.rebuild()
+
+        self.assertFalse(FollowChange.objects.exists())
+        edges = list(Follow.objects.values_list("user_id", "author_id"))
+        expected = reference_scores(edges, reader.pk, 0.5, 6)
+        self.assertEqual(set(self.suggested(reader)), set(expected))
+        after = dict(Suggestion.objects.filter(
+            user__in=bystanders).values_list("pk", "user_id"))
+        self.assertEqual(after, before)
+
+    def test_follow_page_lists_unfollowed_suggestions(self):
+        reader = self.users[0]
+        call_command("build_suggestions", "--full", stdout=StringIO())
+        followed = set(Follow.objects.filter(user=reader)
+                       .values_list("author_id", flat=True))
+        stale = (Suggestion.objects.filter(user=reader)
+                 .order_by("rank").first())
+        Follow.objects.create(user=reader, author=stale.author)
+        client = Client()
+        client.force_login(reader)
+        response = client.get(reverse("follow_index"))
+        shown = [row.author_id for row in response.context["suggestions"]]
+        self.assertTrue(shown)
+        self.assertNotIn(stale.author_id, shown)
+        self.assertFalse(set(shown) & followed)
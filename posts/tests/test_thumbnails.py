@@ -0,0 +1,101 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts import images, thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="L.Palmer")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        content = io.BytesIO()
+        Image.new("RGB", (1200, 800), (200, 30, 30)).save(content, "JPEG")
+        self.post = Post.objects.create(
+            text="Она завёрнута в пластик",
+            author=self.author,
+            image=SimpleUploadedFile("laura.jpg", content.getvalue(),
+                                     content_type="image/jpeg"),
+        )
+
+    def render(self, post):
+        template = Template("{% load post_images %}"
+                            "{% post_image post %}")
+        return template.render(Context({"post": post}))
+
+    def test_original_image_is_shown_until_thumbnails_are_ready(self):
+        html = self.render(self.post)
+        self.assertIn(f'src="{self.post.image.url}"', html)
+        self.assertNotIn("srcset", html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_generated_thumbnails_are_served_with_srcset(self):
+        thumbnails.generate(self.post.image.name)
+        ready = thumbnails.ready(self.post.image)
+        self.assertEqual(list(ready), ["image/webp", "image/jpeg"])
+        html = self.render(self.post)
+        self.assertIn('<source type="image/webp"', html)
+        for files in ready.values():
+            self.assertEqual([width for width, _ in files],
+                             list(settings.POST_IMAGE_WIDTHS))
+            for width, thumbnail in files:
+                self.assertEqual(thumbnail.width, width)
+                self.assertIn(f"{thumbnail.url} {width}w", html)
+        self.assertNotIn(f'src="{self.post.image.url}"', html)
+
+    def test_render_never_builds_thumbnails(self):
+        self.render(self.post)
+        self.assertEqual(thumbnails.ready(self.post.image), {})
+
+    def test_transcoded_original_offers_webp_with_jpeg_fallback(self):
+        with self.post.image.open() as upload:
+            name = images.store(Post._meta.get_field("image"),
+                                images.transcode(upload))
+        post = Post.objects.create(text="Совы не то, чем кажутся",
+                                   author=self.author, image=name)
+        html = self.render(post)
+        self.assertIn(
+            f'<source type="image/webp" srcset="{post.image.url}"', html)
+        self.assertIn(f'src="{post.image.url[:-len("webp")]}jpg"', html)
+
+    def test_post_without_image_renders_nothing(self):
+        post = Post.objects.create(text="Без картинки", author=self.author)
+        self.assertNotIn("<img", self.render(post))
+
+    def test_feed_page_resolves_thumbnails_in_one_query(self):
+        for number in range(3):
+            Post.objects.create(text=f"Запись {number}", author=self.author,
+                                image=self.post.image.name)
+        thumbnails.generate(self.post.image.name)
+        cache.clear()
+        with self.assertNumQueries(2):
+            posts = list(Post.objects.for_feed())
+        self.assertEqual(len(posts), 4)
+        for post in posts:
+            self.assertEqual(len(post.thumbnails["image/jpeg"]),
+                             len(settings.POST_IMAGE_WIDTHS))
+        with self.assertNumQueries(1):
+            list(Post.objects.for_feed())
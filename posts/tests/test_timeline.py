@@ -0,0 +1,168 @@
+import re
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, Timeline
+from yatube.settings import POSTS_PER_PAGE, UNREAD_LIMIT
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="W.White")
+        cls.reader = User.objects.create_user(username="J.Pinkman")
+        cls.other = User.objects.create_user(username="S.Goodman")
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.reader_client.get(reverse("follow_index"))
+        return [post.id for post in response.context["page"]]
+
+    def test_new_post_is_pushed_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text="Say my name", author=self.author)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=post).exists())
+        self.assertFalse(Timeline.objects.filter(user=self.other).exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        post = Post.objects.create(text="I am the one", author=self.author)
+        self.reader_client.get(
+            reverse("profile_follow", kwargs={"username": self.author}))
+        self.assertEqual(self.feed_ids(), [post.id])
+        self.reader_client.get(
+            reverse("profile_unfollow", kwargs={"username": self.author}))
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_is_read_without_fanout(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(text="Tread lightly", author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        self.assertFalse(
+            Follow.objects.filter(author=self.author, pull=False).exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_trim_keeps_latest_entries(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(text=f"Cook {number}", author=self.author)
+                 for number in range(4)]
+        call_command("trim_timelines", stdout=StringIO())
+        kept = Timeline.objects.filter(user=self.reader)
+        self.assertEqual(sorted(kept.values_list("post_id", flat=True)),
+                         [posts[2].id, posts[3].id])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_trim_command_caps_every_follower(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        posts = [Post.objects.create(text=f"Batch {number}",
+                                     author=self.author)
+                 for number in range(4)]
+        # Рассылка не обрезает ленты.
+        self.assertEqual(Timeline.objects.filter(user=self.reader).count(), 4)
+        call_command("trim_timelines", stdout=StringIO())
+        for user in (self.reader, self.other):
+            kept = Timeline.objects.filter(user=user)
+            self.assertEqual(sorted(kept.values_list("post_id", flat=True)),
+                             [posts[2].id, posts[3].id])
+
+    def test_feed_merges_pushed_and_pulled_authors_in_order(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        for number in range(POSTS_PER_PAGE):
+            Post.objects.create(text=f"Cook {number}", author=self.author)
+            Post.objects.create(text=f"Better call {number}",
+                                author=self.other)
+        # Адвокат стал популярным: его старые записи уже в ленте,
+        # а новые лента читает сама.
+        Follow.objects.filter(author=self.other).update(pull=True)
+        for number in range(3):
+            Post.objects.create(text=f"Saul {number}", author=self.other)
+        expected = list(
+            Post.objects.filter(author__in=[self.author, self.other])
+            .order_by("-pub_date", "-id").values_list("id", flat=True))
+        self.assertEqual(len(expected), POSTS_PER_PAGE * 2 + 3)
+        seen = []
+        url = reverse("follow_index")
+        while url:
+            page = self.reader_client.get(url).context["page"]
+            seen.extend(post.id for post in page)
+            url = page.has_next() and (
+                reverse("follow_index") + f"?cursor={page.next_cursor}")
+        self.assertEqual(seen, expected)
+        response = self.reader_client.get(reverse("follow_index") + "?page=3")
+        self.assertEqual([post.id for post in response.context["page"]],
+                         expected[POSTS_PER_PAGE * 2:])
+
+
+class UnreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="G.Fring")
+        cls.popular = User.objects.create_user(username="H.Salamanca")
+        cls.reader = User.objects.create_user(username="M.Ehrmantraut")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.popular, pull=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def badge(self, url=None, response=None):
+        response = response or self.client.get(url or reverse("index"))
+        found = re.search(r'Моя лента <span class="badge badge-primary">'
+                          r'([^<]*)</span>', response.content.decode())
+        return found.group(1) if found else ""
+
+    def test_counts_pushed_and_pulled_posts_since_last_visit(self):
+        Post.objects.create(text="Старая партия", author=self.author)
+        self.assertEqual(self.badge(), "1")
+        self.client.get(reverse("follow_index"))
+        self.assertEqual(self.badge(), "")
+        Post.objects.create(text="Лос Поллос", author=self.author)
+        Post.objects.create(text="Дзинь", author=self.popular)
+        Post.objects.create(text="Чужая", author=self.reader)
+        self.assertEqual(self.badge(reverse("group_index")), "2")
+
+    def test_badge_is_capped(self):
+        Post.objects.bulk_create(
+            Post(text=f"Партия {number}", author=self.popular)
+            for number in range(UNREAD_LIMIT + 5))
+        with self.assertNumQueries(2):
+            count = timeline.unread(self.reader, UNREAD_LIMIT + 1)
+        self.assertEqual(count, UNREAD_LIMIT + 1)
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, f"{UNREAD_LIMIT}+")
+
+    def test_visit_changes_the_etag_of_other_pages(self):
+        Post.objects.create(text="Белый грузовик", author=self.author)
+        url = reverse("index")
+        etag = self.client.get(url)["ETag"]
+        self.client.get(reverse("follow_index"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "badge-primary")
+
+    def test_new_post_changes_the_etag_of_other_pages(self):
+        url = reverse("profile", kwargs={"username": self.popular.username})
+        etag = self.client.get(url)["ETag"]
+        Post.objects.create(text="Новая партия", author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.badge(response=response), "1")
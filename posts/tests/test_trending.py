@@ -0,0 +1,115 @@
+import math
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Group, Post, TrendingGroup, TrendingPost
+
+User = get_user_model()
+
+HOUR = 60 * 60
+
+
+@override_settings(TRENDING_HALF_LIFE=HOUR, TRENDING_POST_WEIGHT=2.0,
+                   TRENDING_COMMENT_WEIGHT=1.0, TRENDING_MIN_SCORE=0.05)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="W.White")
+        cls.reader = User.objects.create_user(username="J.Pinkman")
+        cls.group = Group.objects.create(title="Лос Поллос Эрманос",
+                                         slug="pollos")
+        cls.posts = [Post(text=f"Партия {number}", author=cls.author)
+                     for number in range(3)]
+        Post.objects.bulk_create(cls.posts)
+        cls.posts = list(Post.objects.order_by("id"))
+
+    def score(self, post, timestamp):
+        return trending.current(TrendingPost.objects.get(post=post).score,
+                                timestamp)
+
+    def test_events_accumulate_with_decay(self):
+        post = self.posts[0]
+        trending.bump(TrendingPost, post.pk, 2.0, timestamp=0)
+        trending.bump(TrendingPost, post.pk, 1.0, timestamp=HOUR)
+        self.assertAlmostEqual(self.score(post, HOUR), 2.0 / 2 + 1.0)
+        self.assertAlmostEqual(self.score(post, 3 * HOUR), 2.0 / 8 + 1.0 / 4)
+
+    def test_recent_activity_outranks_old_activity(self):
+        old, recent, quiet = self.posts
+        for _ in range(4):
+            trending.bump(TrendingPost, old.pk, 1.0, timestamp=0)
+        trending.bump(TrendingPost, recent.pk, 1.0, timestamp=3 * HOUR)
+        trending.bump(TrendingPost, quiet.pk, 1.0, timestamp=0)
+        self.assertEqual(list(trending.top_posts(3)), [recent, old, quiet])
+
+    def test_new_posts_and_comments_are_counted(self):
+        post = Post.objects.create(text="Синий продукт", author=self.author,
+                                   group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text="Йоу")
+        stored = TrendingPost.objects.get(post=post).score
+        self.assertAlmostEqual(trending.current(stored), 3.0, places=3)
+        group = TrendingGroup.objects.get(group=self.group)
+        self.assertAlmostEqual(trending.current(group.score), 3.0, places=3)
+
+    @override_settings(TRENDING_SIZE=2)
+    def test_compaction_drops_decayed_and_overflow(self):
+        now = 100 * HOUR
+        trending.bump(TrendingPost, self.posts[0].pk, 1.0, timestamp=0)
+        for number, post in enumerate(self.posts[1:]):
+            trending.bump(TrendingPost, post.pk, 1.0 + number, timestamp=now)
+        extra = Post.objects.create(text="Ещё", author=self.author)
+        TrendingPost.objects.filter(post=extra).delete()
+        trending.bump(TrendingPost, extra.pk, 5.0, timestamp=now)
+
+        removed = trending.compact(now)
+
+        self.assertEqual(removed, 2)
+        self.assertEqual(
+            set(TrendingPost.objects.values_list("post_id", flat=True)),
+            {self.posts[2].pk, extra.pk})
+
+    def test_command_keeps_fresh_scores(self):
+        post = Post.objects.create(text="Я тот, кто стучит",
+                                   author=self.author)
+        trending.bump(TrendingPost, self.posts[0].pk, 1.0, timestamp=0)
+        call_command("compact_trending", stdout=StringIO())
+        self.assertEqual(list(TrendingPost.objects.values_list(
+            "post_id", flat=True)), [post.pk])
+
+    def test_pages_read_the_leaderboard(self):
+        cache.clear()
+        post = Post.objects.create(text="Скажи моё имя", author=self.author,
+                                   group=self.group)
+        response = Client().get(reverse("trending"))
+        self.assertEqual(list(response.context["posts"]), [post])
+        self.assertContains(response, post.text)
+        self.assertContains(response, self.group.title)
+        fragment = Client().get(reverse("trending_groups"))
+        self.assertContains(fragment, reverse("group",
+                                              args=[self.group.slug]))
+        group_page = Client().get(reverse("group", args=[self.group.slug]))
+        self.assertContains(group_page, reverse("trending_groups"))
+
+    def test_groups_fragment_is_cached(self):
+        cache.clear()
+        Post.objects.create(text="Синий кристалл", author=self.author,
+                            group=self.group)
+        Client().get(reverse("trending_groups"))
+        with self.assertNumQueries(0):
+            fragment = Client().get(reverse("trending_groups"))
+        self.assertContains(fragment, self.group.title)
+
+    def test_scores_stay_finite_far_in_the_future(self):
+        post = self.posts[0]
+        far = 10 ** 4 * HOUR
+        trending.bump(TrendingPost, post.pk, 1.0, timestamp=far)
+        trending.bump(TrendingPost, post.pk, 1.0, timestamp=far)
+        stored = TrendingPost.objects.get(post=post).score
+        self.assertTrue(math.isfinite(stored))
+        self.assertAlmostEqual(trending.current(stored, far), 2.0)
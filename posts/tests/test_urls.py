@@ -5,6 +5,7 @@ from django.test import Client, TestCase
 from django.urls import reverse
 
 from posts.models import Group, Post
+from users.forms import CreationForm
 
 User = get_user_model()
 
@@ -116,3 +117,21 @@ class PostURLTests(TestCase):
     def test_page_not_found(self):
         response = self.guest_client.get("/this_page_does_not_exist/")
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_signup_rejects_usernames_taken_by_pages(self):
+        for username in ("search", "group", "trending", "notifications",
+                         "more", "follow", "new", "admin"):
+            with self.subTest(username=username):
+                form = CreationForm(data={
+                    "username": username,
+                    "password1": "Vicodin-500mg",
+                    "password2": "Vicodin-500mg",
+                })
+                self.assertIn("username", form.errors)
+        response = self.guest_client.post(reverse("signup"), {
+            "username": "J.Wilson",
+            "password1": "Vicodin-500mg",
+            "password2": "Vicodin-500mg",
+        })
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertTrue(User.objects.filter(username="J.Wilson").exists())
@@ -6,11 +6,13 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post
-from yatube.settings import POSTS_PER_PAGE
+from posts.models import Comment, Follow, Group, Post
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -54,6 +56,7 @@ class PostViewTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.author)
@@ -147,7 +150,7 @@ class PostViewTests(TestCase):
 
     def test_cache_index(self):
         response_1 = self.authorized_client.get(reverse("index"))
-        Post.objects.create(text="Test cache", author=self.author)
+        Post.objects.filter(pk=self.post.pk).update(text="Test cache")
         response_2 = self.authorized_client.get(reverse("index"))
         self.assertEqual(
             response_1.content, response_2.content)
@@ -155,6 +158,36 @@ class PostViewTests(TestCase):
         response_3 = self.authorized_client.get(reverse("index"))
         self.assertNotEqual(response_2.content, response_3.content)
 
+    def test_cache_is_invalidated_by_writes(self):
+        pages = (
+            reverse("index"),
+            reverse("group", kwargs={"slug": self.group.slug}),
+            reverse("profile", kwargs={"username": self.author}),
+        )
+        for page in pages:
+            self.guest_client.get(page)
+        self.authorized_client.post(
+            reverse("post_edit", kwargs={"username": self.author,
+                                         "post_id": self.post.id}),
+            data={"text": "Отредактировано", "group": self.group.id})
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                self.assertContains(response, "Отредактировано")
+        Post.objects.create(text="Свежая запись", author=self.author)
+        response = self.guest_client.get(reverse("index"))
+        self.assertContains(response, "Свежая запись")
+
+    def test_moved_post_leaves_old_group_page(self):
+        group_page = reverse("group", kwargs={"slug": self.group.slug})
+        self.guest_client.get(group_page)
+        other = Group.objects.create(title="Бегство", slug="flashforward")
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = other
+        post.save()
+        response = self.guest_client.get(group_page)
+        self.assertNotContains(response, post.text)
+
     def test_follow_feature(self):
         user_client = Client()
         user_client.force_login(self.user)
@@ -197,3 +230,235 @@ class PostViewTests(TestCase):
         self.authorized_client.force_login(non_follower)
         response = self.authorized_client.get(reverse("follow_index"))
         self.assertEqual(len(response.context["page"]), 0)
+
+
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title="Клиника", slug="scrubs")
+        cls.author = User.objects.create_user(username="J.Dorian")
+        cls.reader = User.objects.create_user(username="C.Turk")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def add_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(text=f"Запись {number}",
+                                       author=self.author,
+                                       group=self.group)
+            for commenter in (self.author, self.reader):
+                Comment.objects.create(text="Орёл!", author=commenter,
+                                       post=post)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_pages_do_not_query_per_post(self):
+        urls = (
+            reverse("index"),
+            reverse("group", kwargs={"slug": self.group.slug}),
+            reverse("profile", kwargs={"username": self.author}),
+            reverse("follow_index"),
+        )
+        self.add_posts(1)
+        few = {url: self.count_queries(url) for url in urls}
+        self.add_posts(POSTS_PER_PAGE)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), few[url])
+
+    def test_post_page_does_not_query_per_comment(self):
+        self.add_posts(1)
+        post = Post.objects.first()
+        url = reverse("post", kwargs={"username": self.author,
+                                      "post_id": post.id})
+        few = self.count_queries(url)
+        Comment.objects.bulk_create(
+            Comment(text="Ещё", author=self.reader, post=post)
+            for _ in range(10))
+        self.assertEqual(self.count_queries(url), few)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title="Друзья", slug="friends")
+        cls.author = User.objects.create_user(username="R.Geller")
+        cls.post = Post.objects.create(text="Мы были в перерыве!",
+                                       author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.pages = (
+            reverse("index"),
+            reverse("group", kwargs={"slug": self.group.slug}),
+            reverse("profile", kwargs={"username": self.author}),
+            reverse("post", kwargs={"username": self.author,
+                                    "post_id": self.post.id}),
+        )
+
+    def test_cached_pages_need_no_queries(self):
+        for page in self.pages:
+            with self.subTest(page=page):
+                first = self.guest_client.get(page)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(page)
+                self.assertEqual(first.content, second.content)
+
+    def test_logged_in_users_bypass_cache(self):
+        user_client = Client()
+        user_client.force_login(self.author)
+        user_client.get(self.pages[0])
+        with CaptureQueriesContext(connection) as queries:
+            user_client.get(self.pages[0])
+        self.assertTrue(queries)
+
+    def test_writes_purge_cached_pages(self):
+        for page in self.pages:
+            self.guest_client.get(page)
+        reader = User.objects.create_user(username="M.Geller")
+        Comment.objects.create(text="Это не так", post=self.post,
+                               author=reader)
+        Follow.objects.create(user=reader, author=self.author)
+        response = self.guest_client.get(self.pages[3])
+        self.assertContains(response, "Это не так")
+        self.assertContains(response, "Подписчиков: 1")
+        response = self.guest_client.get(self.pages[2])
+        self.assertContains(response, "Комментариев")
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="J.Bartlet")
+        cls.post = Post.objects.create(text="Что дальше?", author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(text=f"Реплика {number}", post=cls.post,
+                    author=cls.author)
+            for number in range(COMMENTS_PER_PAGE * 2 + 3)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.kwargs = {"username": self.author.username,
+                       "post_id": self.post.id}
+
+    def test_post_page_renders_first_page_of_comments(self):
+        response = self.guest_client.get(reverse("post", kwargs=self.kwargs))
+        page = response.context["comments_page"]
+        self.assertEqual(len(page), COMMENTS_PER_PAGE)
+        self.assertTrue(page.has_next())
+        expected = Comment.objects.order_by("-created", "-id")
+        self.assertEqual([comment.id for comment in page],
+                         [comment.id for comment in
+                          expected[:COMMENTS_PER_PAGE]])
+
+    def test_fragment_walks_remaining_comments(self):
+        response = self.guest_client.get(reverse("post", kwargs=self.kwargs))
+        cursor = response.context["comments_page"].next_cursor
+        seen = [comment.id for comment in response.context["comments_page"]]
+        url = reverse("comments_more", kwargs=self.kwargs)
+        while cursor:
+            response = self.guest_client.get(url, {"cursor": cursor})
+            self.assertTemplateUsed(response, "inclusions/comment_item.html")
+            page = response.context["page"]
+            seen.extend(comment.id for comment in page)
+            cursor = page.next_cursor
+        self.assertEqual(sorted(seen),
+                         sorted(Comment.objects.values_list("id", flat=True)))
+
+    def test_post_page_queries_do_not_grow_with_comments(self):
+        url = reverse("post", kwargs=self.kwargs)
+        with CaptureQueriesContext(connection) as before:
+            self.guest_client.get(url)
+        Comment.objects.bulk_create(
+            Comment(text="Ещё", post=self.post, author=self.author)
+            for _ in range(COMMENTS_PER_PAGE)
+        )
+        cache.clear()
+        with self.assertNumQueries(len(before)):
+            self.guest_client.get(url)
+
+
+@override_settings(COMMENT_MAX_DEPTH=2, COMMENT_MAX_REPLIES=3)
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="D.Cooper")
+        cls.post = Post.objects.create(text="Кто убил Лору Палмер?",
+                                       author=cls.author)
+        cls.other_post = Post.objects.create(text="Вишнёвый пирог",
+                                             author=cls.author)
+        cls.root = Comment.objects.create(text="Совы не то, чем кажутся",
+                                          post=cls.post, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.kwargs = {"username": self.author.username,
+                       "post_id": self.post.id}
+
+    def reply(self, parent, text="Ответ"):
+        self.client.post(reverse("add_comment", kwargs=self.kwargs),
+                         {"text": text, "parent": parent.id})
+        return Comment.objects.latest("id")
+
+    def test_replies_render_under_their_root_in_tree_order(self):
+        first = self.reply(self.root, "Первый")
+        nested = self.reply(first, "Вложенный")
+        second = self.reply(self.root, "Второй")
+        response = self.client.get(reverse("post", kwargs=self.kwargs))
+        root, = response.context["comments_page"]
+        self.assertEqual(root.replies_tree, [first, nested, second])
+        self.assertEqual([reply.depth for reply in root.replies_tree],
+                         [1, 2, 1])
+        self.assertEqual(nested.parent, first)
+
+    def test_deep_reply_attaches_to_deepest_allowed_ancestor(self):
+        first = self.reply(self.root)
+        nested = self.reply(first)
+        deeper = self.reply(nested)
+        self.assertEqual(deeper.parent, first)
+        self.assertEqual(deeper.depth, 2)
+
+    def test_sibling_limit_rejects_extra_reply(self):
+        for _ in range(3):
+            self.reply(self.root)
+        count = Comment.objects.count()
+        self.reply(self.root)
+        self.assertEqual(Comment.objects.count(), count)
+
+    def test_parent_from_another_post_is_rejected(self):
+        foreign = Comment.objects.create(text="Чёрный вигвам",
+                                         post=self.other_post,
+                                         author=self.author)
+        count = Comment.objects.count()
+        self.reply(foreign)
+        self.assertEqual(Comment.objects.count(), count)
+
+    def test_threads_of_a_page_load_in_one_query(self):
+        roots = [self.root] + [
+            Comment.objects.create(text=f"Корень {number}", post=self.post,
+                                   author=self.author)
+            for number in range(3)
+        ]
+        for root in roots:
+            self.reply(self.reply(root))
+        with self.assertNumQueries(1):
+            threads = self.post.comments.attach_replies(roots)
+        self.assertEqual([len(root.replies_tree) for root in threads],
+                         [2] * len(roots))
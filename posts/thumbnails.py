@@ -0,0 +1,174 @@
+"""Миниатюры картинок к записям.
+
+Все размеры из ``POST_IMAGE_WIDTHS`` строятся сразу после сохранения
+записи в пуле процессов и регистрируются в хранилище sorl-thumbnail.
+Шаблоны только читают это хранилище и Pillow в запросе не вызывают:
+пока миниатюр нет, показывается исходная картинка. Для страницы ленты
+миниатюры всех записей читаются одним ``get_many`` и одним запросом
+к базе (см. ``PostQuerySet.with_thumbnails``).
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+logger = logging.getLogger(__name__)
+
+OPTIONS = {"crop": "center", "upscale": True}
+# Браузер сам выбирает первый понятный ему формат из <picture>;
+# JPEG идёт последним и попадает в <img>.
+FORMATS = (("WEBP", "image/webp"), ("JPEG", "image/jpeg"))
+
+_executor = None
+_executor_pid = None
+_pending = set()
+
+
+def geometries():
+    """Пары (ширина, геометрия sorl) для всех размеров миниатюр."""
+    width, height = settings.POST_IMAGE_GEOMETRY
+    return [(size, f"{size}x{round(size * height / width)}")
+            for size in settings.POST_IMAGE_WIDTHS]
+
+
+def generate(name):
+    """Построить все размеры и форматы миниатюр для картинки ``name``."""
+    for _, geometry in geometries():
+        for format, _ in FORMATS:
+            get_thumbnail(name, geometry, format=format, **OPTIONS)
+
+
+def _setup_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=get_context("spawn"),
+            initializer=_setup_worker,
+            initargs=(settings.SETTINGS_MODULE,),
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _done(name, future):
+    _pending.discard(name)
+    error = future.exception()
+    if error is not None:
+        logger.error("Не удалось построить миниатюры для %s", name,
+                     exc_info=error)
+
+
+def schedule(name):
+    """Поставить построение миниатюр в очередь пула."""
+    if not name or name in _pending:
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+        return
+    _pending.add(name)
+    future = _get_executor().submit(generate, name)
+    future.add_done_callback(lambda future: _done(name, future))
+
+
+def schedule_on_commit(image):
+    """Построить миниатюры, когда транзакция с записью зафиксирована."""
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: schedule(name))
+
+
+def _options(format):
+    backend = default.backend
+    options = dict(OPTIONS, format=format)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def _keys(image):
+    source = ImageFile(image)
+    for format, mime in FORMATS:
+        options = _options(format)
+        for width, geometry in geometries():
+            name = default.backend._get_thumbnail_filename(
+                source, geometry, options)
+            yield mime, width, add_prefix(ImageFile(name, default.storage).key)
+
+
+def _get_many(keys):
+    # Модели sorl импортируются здесь: процесс пула загружает этот
+    # модуль, чтобы получить ``generate``, ещё до ``django.setup()``.
+    from sorl.thumbnail.kvstores import cached_db_kvstore
+    from sorl.thumbnail.models import KVStore
+
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        found = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in found.items() if value}
+    empty = cached_db_kvstore.EMPTY_VALUE
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(KVStore.objects.filter(key__in=missing)
+                      .values_list("key", "value"))
+        # Как и sorl, запоминаем отсутствие ключа, чтобы не ходить
+        # в базу снова; построенная миниатюра перезапишет эту отметку.
+        kvstore.cache.set_many(
+            {key: stored.get(key, empty) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(stored)
+    return {key: value for key, value in found.items()
+            if value and value != empty}
+
+
+def _collect(keys, values):
+    found = {}
+    for mime, width, key in keys:
+        if key in values:
+            found.setdefault(mime, []).append(
+                (width, deserialize_image_file(values[key])))
+    return found
+
+
+def attach(posts):
+    """Записать в ``post.thumbnails`` готовые миниатюры каждой записи.
+
+    Ключи всех картинок читаются из хранилища sorl-thumbnail разом.
+    """
+    keys = [list(_keys(post.image)) if post.image else []
+            for post in posts]
+    wanted = [key for post_keys in keys for _, _, key in post_keys]
+    values = _get_many(wanted) if wanted else {}
+    for post, post_keys in zip(posts, keys):
+        post.thumbnails = _collect(post_keys, values)
+
+
+def ready(image):
+    """Готовые миниатюры одной картинки по MIME-типам: ``{тип: [(ширина,
+    ImageFile), ...]}``.
+
+    Смотрит только в хранилище sorl-thumbnail и файлов не читает.
+    """
+    if not image:
+        return {}
+    keys = list(_keys(image))
+    return _collect(keys, _get_many([key for _, _, key in keys]))
@@ -0,0 +1,270 @@
+import heapq
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .models import Follow, Post, Timeline
+from .pagination import FEED_ORDERING, _value
+
+# Поля записи и соответствующие им поля материализованной ленты:
+# сортировка и поиск по курсору идут прямо по индексу Timeline.
+TIMELINE_FIELDS = {"pub_date": "timeline_entries__pub_date",
+                   "id": "timeline_entries__post_id"}
+# Сколько лент обрезается одним DELETE: условие на каждую ленту своё,
+# а глубина выражения в SQLite ограничена.
+TRIM_BATCH = 100
+
+User = get_user_model()
+
+
+def push(post):
+    """Разослать новую запись в ленты подписчиков автора.
+
+    Если подписчиков больше ``TIMELINE_FANOUT_LIMIT``, автор переводится
+    в режим чтения без рассылки: его записи лента подтягивает сама.
+    Ленты здесь не обрезаются — это работа команды ``trim_timelines``:
+    чтение идёт по индексу и лишних строк в конце ленты не касается.
+    """
+    followers = Follow.objects.filter(author_id=post.author_id)
+    if followers.filter(pull=True).exists():
+        return
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    user_ids = list(followers.values_list("user_id", flat=True)[:limit + 1])
+    if len(user_ids) > limit:
+        followers.update(pull=True)
+        return
+    Timeline.objects.bulk_create(
+        [Timeline(user_id=user_id, post_id=post.id, pub_date=post.pub_date)
+         for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follow):
+    """Добавить в ленту свежие записи автора, на которого подписались."""
+    popular = Follow.objects.filter(author_id=follow.author_id, pull=True)
+    if popular.exclude(id=follow.id).exists():
+        Follow.objects.filter(id=follow.id).update(pull=True)
+        return
+    recent = Post.objects.filter(author_id=follow.author_id)
+    recent = recent.order_by("-pub_date").values_list("id", "pub_date")
+    Timeline.objects.bulk_create(
+        [Timeline(user_id=follow.user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in recent[:settings.TIMELINE_BACKFILL]],
+        ignore_conflicts=True,
+    )
+    trim([follow.user_id])
+
+
+def prune(follow):
+    """Убрать из ленты записи автора, от которого отписались."""
+    Timeline.objects.filter(user_id=follow.user_id,
+                            post__author_id=follow.author_id).delete()
+
+
+def trim(user_ids):
+    """Оставить в лентах ``user_ids`` не больше ``TIMELINE_LENGTH``
+    последних записей.
+
+    Граница каждой ленты — дата записи на месте ``TIMELINE_LENGTH`` —
+    читается для всех лент одним запросом по индексу; лишнее удаляется
+    пачками по ``TRIM_BATCH`` лент.
+    """
+    length = settings.TIMELINE_LENGTH
+    cutoff = (Timeline.objects.filter(user_id=OuterRef("pk"))
+              .order_by("-pub_date").values("pub_date")[length:length + 1])
+    bounds = [(user_id, pub_date) for user_id, pub_date in
+              User.objects.filter(pk__in=user_ids).order_by()
+              .annotate(cutoff=Subquery(cutoff))
+              .values_list("pk", "cutoff")
+              if pub_date is not None]
+    for start in range(0, len(bounds), TRIM_BATCH):
+        condition = Q()
+        for user_id, pub_date in bounds[start:start + TRIM_BATCH]:
+            condition |= Q(user_id=user_id, pub_date__lte=pub_date)
+        Timeline.objects.filter(condition).delete()
+
+
+def _order(field, names):
+    """Сортировка потока по ``field``.
+
+    Поля ленты передаются выражениями: строкой ``..._post_id`` Django
+    2.2 подставил бы сортировку самой записи и лишнее соединение.
+    """
+    name = field.lstrip("-")
+    if name not in names:
+        return field
+    column = F(names[name])
+    return column.desc() if field.startswith("-") else column.asc()
+
+
+def _where(condition, names):
+    """``condition`` с полями записи, заменёнными на поля ленты."""
+    renamed = Q()
+    renamed.connector, renamed.negated = condition.connector, condition.negated
+    for child in condition.children:
+        if isinstance(child, Q):
+            child = _where(child, names)
+        else:
+            lookup, value = child
+            name, separator, rest = lookup.partition("__")
+            child = (names.get(name, name) + separator + rest, value)
+        renamed.children.append(child)
+    return renamed
+
+
+class Feed:
+    """Лента подписок, слитая из нескольких упорядоченных потоков.
+
+    Материализованная лента читается по индексу Timeline, записи каждого
+    популярного автора — по индексу (author, pub_date). Один ORDER BY
+    поверх OR заставил бы SQLite сортировать всех кандидатов во
+    временном B-дереве; здесь каждый поток отдаёт не больше нужного
+    числа строк уже по порядку, и они сливаются в Python.
+
+    Условие потока копится в ``Q`` и применяется одним ``filter()``:
+    второй вызов по ``timeline_entries`` добавил бы второе соединение
+    с Timeline.
+
+    Повторяет ту часть ``QuerySet``, которой пользуются пагинаторы.
+    """
+
+    model = Post
+    ordered = True
+
+    def __init__(self, streams, combined, ordering=FEED_ORDERING):
+        self.combined = combined
+        self.ordering = ordering
+        self.streams = [
+            (queryset.order_by(*(_order(field, names)
+                                 for field in ordering)), names, condition)
+            for queryset, names, condition in streams
+        ]
+
+    def _map(self, method, *args, **kwargs):
+        streams = [(getattr(queryset, method)(*args, **kwargs), names,
+                    condition)
+                   for queryset, names, condition in self.streams]
+        combined = getattr(self.combined, method)(*args, **kwargs)
+        return Feed(streams, combined, self.ordering)
+
+    def filter(self, *args, **kwargs):
+        extra = Q(*args, **kwargs)
+        streams = [(queryset, names, condition & _where(extra, names))
+                   for queryset, names, condition in self.streams]
+        combined = self.combined.filter(*args, **kwargs)
+        return Feed(streams, combined, self.ordering)
+
+    def for_feed(self):
+        return self._map("for_feed")
+
+    def values(self, *fields):
+        return self._map("values", *fields)
+
+    def order_by(self, *ordering):
+        return Feed(self.streams, self.combined, ordering)
+
+    def count(self):
+        return self.combined.count()
+
+    def aggregate(self, *args, **kwargs):
+        return self.combined.aggregate(*args, **kwargs)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        keys = [field.lstrip("-") for field in self.ordering]
+        merged = heapq.merge(
+            *(queryset.filter(condition)[:stop]
+              for queryset, _, condition in self.streams),
+            key=lambda post: [_value(post, key) for key in keys],
+            reverse=self.ordering[0].startswith("-"),
+        )
+        rows, seen = [], set()
+        for post in merged:
+            # Старые записи популярного автора могли попасть в ленту
+            # ещё до того, как он перешёл на чтение без рассылки.
+            post_id = _value(post, "id")
+            if post_id in seen:
+                continue
+            seen.add(post_id)
+            rows.append(post)
+            if stop is not None and len(rows) == stop:
+                break
+        return rows[start:]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def feed(user):
+    """Лента подписок: материализованная лента плюс записи популярных
+    авторов, которые не рассылаются."""
+    pulled = list(Follow.objects.filter(user=user, pull=True)
+                  .values_list("author_id", flat=True))
+    streams = [(Post.objects.all(), TIMELINE_FIELDS,
+                Q(timeline_entries__user=user))]
+    streams += [(Post.objects.all(), {}, Q(author_id=author_id))
+                for author_id in pulled]
+    timeline = Timeline.objects.filter(user=user).values("post_id")
+    combined = Post.objects.filter(Q(id__in=timeline) | Q(author__in=pulled))
+    return Feed(streams, combined)
+
+
+def last_seen(user):
+    """Когда ``user`` последний раз открывал ленту подписок."""
+    try:
+        return user.stats.follow_seen
+    except ObjectDoesNotExist:
+        return None
+
+
+def mark_seen(user, pub_date):
+    """Сдвинуть отметку вперёд до самой свежей показанной записи.
+
+    Пока новых записей нет, отметка не меняется, и ETag страниц с
+    счётчиком тоже.
+    """
+    try:
+        stats = user.stats
+    except ObjectDoesNotExist:
+        return
+    if stats.follow_seen is None or stats.follow_seen < pub_date:
+        stats.follow_seen = pub_date
+        stats.save(update_fields=["follow_seen"])
+
+
+def unread(user, limit):
+    """Сколько записей ленты новее отметки ``last_seen``, но не больше
+    ``limit``.
+
+    Без сортировки и с ``LIMIT``: материализованная лента читается по
+    диапазону индекса Timeline, популярные авторы — по (author,
+    pub_date), так что запрос не дороже ``limit`` строк на поток.
+    Старые записи популярного автора могут лежать в обоих потоках,
+    поэтому считаются уникальные номера.
+    """
+    entries = Timeline.objects.filter(user=user)
+    pulled = Post.objects.filter(author__in=Follow.objects.filter(
+        user=user, pull=True).values("author"))
+    since = last_seen(user)
+    if since is not None:
+        entries = entries.filter(pub_date__gt=since)
+        pulled = pulled.filter(pub_date__gt=since)
+    seen = set(entries.order_by().values_list("post_id", flat=True)[:limit])
+    seen.update(pulled.order_by().values_list("id", flat=True)[:limit])
+    return min(len(seen), limit)
+
+
+def unread_for(request):
+    """``unread()`` читателя запроса с пределом ``UNREAD_LIMIT + 1``.
+
+    Считается один раз за запрос: его видят и ETag, и значок в шапке.
+    """
+    if not hasattr(request, "_unread_count"):
+        request._unread_count = unread(request.user,
+                                       settings.UNREAD_LIMIT + 1)
+    return request._unread_count
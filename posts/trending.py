@@ -0,0 +1,89 @@
+"""Популярные записи и группы с экспоненциальным затуханием.
+
+Каждое событие (новая запись, комментарий) добавляет вес ``w``, который
+затухает вдвое за ``TRENDING_HALF_LIFE`` секунд. Текущая оценка
+``Σ wᵢ·e^(-λ(t - tᵢ))`` при одном и том же ``t`` упорядочена так же,
+как ``Σ wᵢ·e^(λ·tᵢ)``, поэтому в таблице хранится логарифм второй
+суммы: он не зависит от текущего времени, не переполняется и
+обновляется одним ``INSERT ... ON CONFLICT DO UPDATE`` через
+``log(eᵃ + eᵇ)``. Сортировка по нему идёт прямо по индексу.
+
+Таблицы ограничены сверху: ``compact()`` удаляет затухшие оценки и всё,
+что ниже ``TRENDING_SIZE`` лучших.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Subquery
+
+from .models import Post, TrendingGroup, TrendingPost
+
+
+def _rate():
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def _log_weight(weight, timestamp=None):
+    if timestamp is None:
+        timestamp = time.time()
+    return math.log(weight) + _rate() * timestamp
+
+
+def current(score, timestamp=None):
+    """Оценка на момент ``timestamp`` по сохранённому логарифму."""
+    return math.exp(score - _log_weight(1, timestamp))
+
+
+def bump(model, pk, weight, timestamp=None):
+    table = model._meta.db_table
+    column = model._meta.pk.column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({column}, score) VALUES (%s, %s) "
+            f"ON CONFLICT ({column}) DO UPDATE SET score = "
+            f"MAX(score, excluded.score) "
+            f"+ LN(1 + EXP(-ABS(score - excluded.score)))",
+            [pk, _log_weight(weight, timestamp)])
+
+
+def post_published(post):
+    bump(TrendingPost, post.pk, settings.TRENDING_POST_WEIGHT)
+    if post.group_id:
+        bump(TrendingGroup, post.group_id, settings.TRENDING_POST_WEIGHT)
+
+
+def comment_added(comment):
+    bump(TrendingPost, comment.post_id, settings.TRENDING_COMMENT_WEIGHT)
+    group_id = comment.post.group_id
+    if group_id:
+        bump(TrendingGroup, group_id, settings.TRENDING_COMMENT_WEIGHT)
+
+
+def top_posts(limit):
+    return (Post.objects.for_feed()
+            .filter(trend__isnull=False)
+            .order_by("-trend__score")[:limit])
+
+
+def top_groups(limit):
+    return (TrendingGroup.objects.select_related("group")
+            .order_by("-score")[:limit])
+
+
+def compact(timestamp=None):
+    """Удалить затухшие оценки и всё ниже ``TRENDING_SIZE`` лучших.
+
+    Возвращает число удалённых строк.
+    """
+    cutoff = _log_weight(settings.TRENDING_MIN_SCORE, timestamp)
+    size = settings.TRENDING_SIZE
+    removed = 0
+    for model in (TrendingPost, TrendingGroup):
+        removed += model.objects.filter(score__lt=cutoff).delete()[0]
+        last = (model.objects.order_by("-score")
+                .values_list("score", flat=True)[size - 1:size])
+        removed += model.objects.filter(
+            score__lt=Subquery(last)).delete()[0]
+    return removed
@@ -4,10 +4,22 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("more/", views.index_more, name="index_more"),
+    path("group/", views.group_index, name="group_index"),
     path("group/<slug:slug>/", views.group_posts, name="group"),
+    path("group/<slug:slug>/more/", views.group_more, name="group_more"),
     path("new/", views.new_post, name="new_post"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("follow/more/", views.follow_more, name="follow_more"),
+    path("search/", views.search, name="search"),
+    path("notifications/", views.notifications_inbox, name="notifications"),
+    path("trending/", views.trending_posts, name="trending"),
+    path("trending/groups/", views.trending_groups,
+         name="trending_groups"),
     path("<str:username>/", views.profile, name="profile"),
+    path("<str:username>/more/", views.profile_more, name="profile_more"),
+    path("<str:username>/followers/", views.followers, name="followers"),
+    path("<str:username>/following/", views.following, name="following"),
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
     path(
         "<str:username>/<int:post_id>/edit/",
@@ -16,6 +28,8 @@ urlpatterns = [
     ),
     path("<str:username>/<int:post_id>/comment/",
          views.add_comment, name="add_comment"),
+    path("<str:username>/<int:post_id>/comments/",
+         views.comments_more, name="comments_more"),
     path(
         "<str:username>/follow/", views.profile_follow, name="profile_follow"
     ),
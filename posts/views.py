@@ -1,70 +1,231 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import condition
 
-from yatube.settings import POSTS_PER_PAGE
+from yatube.settings import (COMMENTS_PER_PAGE, EVENTS_URL,
+                             FEED_CACHE_TIMEOUT, FOLLOWS_PER_PAGE,
+                             GROUPS_PER_PAGE, NOTIFICATIONS_PER_PAGE,
+                             POSTS_PER_PAGE, SUGGESTIONS_SHOWN,
+                             TRENDING_CACHE_TIMEOUT, TRENDING_GROUPS_SHOWN,
+                             TRENDING_POSTS_SHOWN)
 
+from . import (conditional, events, follows, generations, notifications,
+               thumbnails, timeline, trending)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Group, Post, Suggestion
+from .page_cache import cache_anonymous
+from .pagination import (COMMENT_ORDERING, FOLLOW_ORDERING, GROUP_ORDERING,
+                         NOTIFICATION_ORDERING, CursorPaginator, get_page)
+from .search import search as find
 
 User = get_user_model()
 
 
+def comments_page(request, post):
+    roots = post.comments.roots().select_related("author")
+    paginator = CursorPaginator(roots, COMMENTS_PER_PAGE, COMMENT_ORDERING)
+    page = paginator.get_page(request.GET.get("cursor"))
+    post.comments.attach_replies(page.object_list)
+    return page
+
+
+def suggested_authors(user):
+    return Suggestion.objects.for_user(user)[:SUGGESTIONS_SHOWN]
+
+
+def feed_more(request, posts, more_url,
+              item_template="inclusions/feed_item.html"):
+    paginator = CursorPaginator(posts, POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get("cursor"))
+    return render(request, "inclusions/feed_more.html",
+                  {"page": page,
+                   "more_url": more_url,
+                   "item_template": item_template})
+
+
+@condition(etag_func=conditional.feed_etag(generations.INDEX))
+@cache_anonymous(generations.INDEX)
 def index(request):
-    latest = Post.objects.all()
-    paginator = Paginator(latest, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return render(request, "index.html", {"page": page})
+    latest = Post.objects.for_feed()
+    page = get_page(request, latest, POSTS_PER_PAGE)
+    return render(request, "index.html",
+                  {"page": page,
+                   "generation": generations.get(generations.INDEX),
+                   "cache_timeout": FEED_CACHE_TIMEOUT,
+                   "events_url": EVENTS_URL})
+
+
+@condition(etag_func=conditional.feed_etag(generations.INDEX))
+@cache_anonymous(generations.INDEX)
+def index_more(request):
+    return feed_more(request, Post.objects.for_feed(),
+                     reverse("index_more"))
+
+
+def group_index(request):
+    """Каталог групп.
+
+    Счётчик и последняя запись хранятся в самой группе, поэтому страница
+    — один запрос по индексу названий. Карточка кэшируется под
+    поколением своей группы и устаревает только вместе с ней.
+    """
+    groups = Group.objects.select_related("last_post__author")
+    paginator = CursorPaginator(groups, GROUPS_PER_PAGE, GROUP_ORDERING)
+    page = paginator.get_page(request.GET.get("cursor"))
+    scopes = [generations.group(group.slug) for group in page]
+    for group, generation in zip(page, generations.get_each(scopes)):
+        group.generation = generation
+    return render(request, "groups.html",
+                  {"page": page,
+                   "cache_timeout": FEED_CACHE_TIMEOUT})
 
 
+@condition(etag_func=conditional.feed_etag(generations.GROUP))
+@cache_anonymous(generations.GROUP)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return render(request, "group.html", {"group": group, "page": page})
+    posts = group.posts.for_feed()
+    page = get_page(request, posts, POSTS_PER_PAGE, count=group.posts_count)
+    return render(request, "group.html",
+                  {"group": group,
+                   "page": page,
+                   "generation": generations.get(generations.group(slug)),
+                   "cache_timeout": FEED_CACHE_TIMEOUT})
+
+
+@condition(etag_func=conditional.feed_etag(generations.GROUP))
+@cache_anonymous(generations.GROUP)
+def group_more(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_more(request, group.posts.for_feed(),
+                     reverse("group_more", kwargs={"slug": slug}))
 
 
 @login_required
+@transaction.atomic
 def new_post(request):
     form = PostForm(request.POST or None, request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule_on_commit(post.image)
+        transaction.on_commit(lambda: events.publish_post(post))
         return redirect("index")
     return render(request, "new_post.html", {"form": form})
 
 
+@condition(etag_func=conditional.feed_etag(generations.PROFILE))
+@cache_anonymous(generations.PROFILE)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(User.objects.select_related("stats"),
+                               username=username)
+    post_list = author.posts.for_feed()
+    posts_count = None
+    if hasattr(author, "stats"):
+        posts_count = author.stats.posts_count
+    page = get_page(request, post_list, POSTS_PER_PAGE, count=posts_count)
     following = False
     if request.user.is_authenticated:
         following = author.following.filter(user=request.user).exists()
-    return render(request, "profile.html", {"page": page,
-                                            "author": author,
-                                            "following": following})
+    is_owner = request.user == author
+    suggestions = None
+    if is_owner:
+        suggestions = suggested_authors(request.user)
+    generation = generations.get(generations.profile(username))
+    return render(request, "profile.html",
+                  {"page": page,
+                   "author": author,
+                   "following": following,
+                   "is_owner": is_owner,
+                   "suggestions": suggestions,
+                   "generation": generation,
+                   "cache_timeout": FEED_CACHE_TIMEOUT})
+
+
+@condition(etag_func=conditional.feed_etag(generations.PROFILE))
+@cache_anonymous(generations.PROFILE)
+def profile_more(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_more(request, author.posts.for_feed(),
+                     reverse("profile_more", kwargs={"username": username}),
+                     item_template="inclusions/post_item.html")
+
+
+def follow_list(request, username, relation, side, title):
+    """Страница подписчиков или подписок ``username``.
+
+    ``relation`` — related name у ``Follow``, ``side`` — поле с
+    пользователем, которого показываем.
+    """
+    author = get_object_or_404(User.objects.select_related("stats"),
+                               username=username)
+    rows = getattr(author, relation).select_related(side)
+    paginator = CursorPaginator(rows, FOLLOWS_PER_PAGE, FOLLOW_ORDERING)
+    page = paginator.get_page(request.GET.get("cursor"))
+    people = [getattr(row, side) for row in page]
+    followed = follows.followed_among(request.user,
+                                      [person.pk for person in people])
+    for person in people:
+        person.is_followed = person.pk in followed
+    return render(request, "follow_list.html",
+                  {"author": author,
+                   "page": page,
+                   "people": people,
+                   "title": title})
+
 
+@condition(etag_func=conditional.follow_list_etag)
+@cache_anonymous(generations.PROFILE)
+def followers(request, username):
+    return follow_list(request, username, "following", "user",
+                       "Подписчики")
 
+
+@condition(etag_func=conditional.follow_list_etag)
+@cache_anonymous(generations.PROFILE)
+def following(request, username):
+    return follow_list(request, username, "follower", "author",
+                       "Подписки")
+
+
+@condition(etag_func=conditional.post_etag)
+@cache_anonymous(generations.POST, generations.PROFILE)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    posts = Post.objects.for_feed().select_related("author__stats")
+    post = get_object_or_404(posts,
+                             id=post_id,
+                             author__username=username)
     author = post.author
     form = CommentForm()
-    comments = post.comments.all()
+    page = comments_page(request, post)
+    # Шаблоны выводят ``comments_page``; ``comments`` — те же корневые
+    # комментарии страницы запросом, а не все комментарии записи.
+    comments = post.comments.filter(pk__in=[comment.pk for comment in page])
     return render(request, "post.html", {"post": post,
                                          "author": author,
                                          "form": form,
-                                         "comments": comments})
+                                         "comments": comments,
+                                         "comments_page": page})
+
+
+@condition(etag_func=conditional.post_etag)
+@cache_anonymous(generations.POST, generations.PROFILE)
+def comments_more(request, username, post_id):
+    post = get_object_or_404(Post, id=post_id, author__username=username)
+    more_url = reverse("comments_more", kwargs={"username": username,
+                                                "post_id": post_id})
+    return render(request, "inclusions/comments_more.html",
+                  {"post": post,
+                   "page": comments_page(request, post),
+                   "more_url": more_url})
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
     if request.user != post.author:
@@ -74,20 +235,24 @@ def post_edit(request, username, post_id):
                     instance=post)
     if form.is_valid():
         form.save()
+        if "image" in form.changed_data:
+            thumbnails.schedule_on_commit(post.image)
         return redirect("post", username=username, post_id=post_id)
     return render(request, "new_post.html", {"post": post,
                                              "form": form})
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
-    form = CommentForm(request.POST or None)
+    form = CommentForm(request.POST or None, post=post)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
         comment.save()
+        notifications.commented(comment)
     return redirect("post", username=username, post_id=post_id)
 
 
@@ -102,28 +267,73 @@ def server_error(request):
 
 
 @login_required
+@condition(etag_func=conditional.follow_etag)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return render(request, "follow.html", {"page": page})
+    post_list = timeline.feed(request.user).for_feed()
+    page = get_page(request, post_list, POSTS_PER_PAGE)
+    if page:
+        timeline.mark_seen(request.user, page[0].pub_date)
+    return render(request, "follow.html",
+                  {"page": page,
+                   "events_url": EVENTS_URL,
+                   "suggestions": suggested_authors(request.user)})
 
 
 @login_required
+@condition(etag_func=conditional.follow_etag)
+def follow_more(request):
+    post_list = timeline.feed(request.user).for_feed()
+    return feed_more(request, post_list, reverse("follow_more"))
+
+
+@login_required
+def notifications_inbox(request):
+    """Входящие уведомления; открытие страницы отмечает их просмотренными.
+
+    Страница читается до отметки, чтобы новые можно было выделить.
+    """
+    paginator = CursorPaginator(notifications.inbox(request.user),
+                                NOTIFICATIONS_PER_PAGE,
+                                NOTIFICATION_ORDERING)
+    page = paginator.get_page(request.GET.get("cursor"))
+    notifications.mark_seen(request.user)
+    return render(request, "notifications.html", {"page": page})
+
+
+def trending_posts(request):
+    return render(request, "trending.html",
+                  {"posts": trending.top_posts(TRENDING_POSTS_SHOWN),
+                   "groups": trending.top_groups(TRENDING_GROUPS_SHOWN),
+                   "cache_timeout": TRENDING_CACHE_TIMEOUT})
+
+
+def trending_groups(request):
+    # Фрагмент подгружает каждая страница группы: запрос к базе идёт,
+    # только когда истёк кэш в шаблоне.
+    return render(request, "inclusions/trending_groups.html",
+                  {"groups": trending.top_groups(TRENDING_GROUPS_SHOWN),
+                   "cache_timeout": TRENDING_CACHE_TIMEOUT})
+
+
+def search(request):
+    query = request.GET.get("q", "").strip()
+    page = find(query, request.GET.get("cursor"), POSTS_PER_PAGE)
+    return render(request, "search.html", {"page": page, "query": query})
+
+
+@login_required
+@transaction.atomic
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    follow_now = Follow.objects.filter(
-        user=request.user, author=author).exists()
-    if not follow_now and author != request.user:
-        Follow.objects.create(user=request.user, author=author)
+    # Пустой ответ — это и повторная подписка, и подписка на себя:
+    # только тогда имя проверяется отдельным запросом.
+    if not follows.follow(request.user, [username]):
+        get_object_or_404(User.objects.only("id"), username=username)
     return redirect("profile", username=username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
-    database_entry = Follow.objects.filter(
-        user=request.user, author__username=username)
-    if database_entry.exists():
-        database_entry.delete()
+    if not follows.unfollow(request.user, [username]):
+        get_object_or_404(User.objects.only("id"), username=username)
     return redirect("profile", username=username)
@@ -1,4 +1,14 @@
+import pytest
+
+from yatube import testing
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_files():
+    with testing.isolated():
+        yield
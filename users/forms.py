@@ -1,11 +1,35 @@
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
+from django.urls import NoReverseMatch, Resolver404, resolve, reverse
 
 
 User = get_user_model()
 
+# Адреса профиля: имя, у которого любой из них уводит на другую
+# страницу (``search/``, ``group/``, ``more/``...), занято сайтом.
+PROFILE_URLS = ("profile", "profile_more", "followers", "following")
+
+
+def is_reserved(username):
+    for name in PROFILE_URLS:
+        try:
+            url = reverse(name, kwargs={"username": username})
+            if resolve(url).url_name != name:
+                return True
+        except (NoReverseMatch, Resolver404):
+            return True
+    return False
+
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        if is_reserved(username):
+            raise forms.ValidationError(
+                "Это имя занято страницей сайта, выберите другое.")
+        return username
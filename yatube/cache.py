@@ -0,0 +1,332 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим mmap-файлом.
+
+Второй уровень — файл фиксированного размера, разбитый на слоты. Его
+отображают в память все воркеры хоста, поэтому кэш общий и тёплый для
+всех процессов, а запись или удаление в одном воркере сразу видна в
+остальных. Ключ попадает в один из ``PROBE`` слотов подряд, начиная с
+его хэша; если свободного нет, вытесняется давно не читанный слот.
+
+Первый уровень хранит уже распакованные значения. Каждая запись
+первого уровня помнит номер версии своего слота, и перед выдачей
+значения этот номер сверяется с файлом — это одно чтение из памяти.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.TwoTierCache',
+            'LOCATION': '/var/cache/yatube/cache.bin',
+            'OPTIONS': {'SLOTS': 2048, 'SLOT_SIZE': 32768,
+                        'MAX_ENTRIES': 512},
+        }
+    }
+"""
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - нет на Windows
+    fcntl = None
+
+MAGIC = b"YTC1"
+FILE_HEADER = struct.Struct("<4sIIQ")
+FILE_HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QdQdII")
+PROBE = 8
+COMPRESS_MIN = 1024
+COMPRESSED = 1
+
+_local_caches = {}
+_local_locks = {}
+_files = {}
+_files_lock = threading.Lock()
+
+
+class _SharedFile:
+    """Отображённый в память файл и блокировки к нему в одном процессе."""
+
+    def __init__(self, path, slots, slot_size):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.slots = slots
+        self.slot_size = slot_size
+        self.size = FILE_HEADER_SIZE + slots * slot_size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.lock = threading.RLock()
+        with self.exclusive():
+            if os.fstat(self.fd).st_size != self.size:
+                os.ftruncate(self.fd, self.size)
+            self.map = mmap.mmap(self.fd, self.size)
+            magic, found_slots, found_size, _ = FILE_HEADER.unpack_from(
+                self.map, 0)
+            if (magic, found_slots, found_size) != (MAGIC, slots, slot_size):
+                self.map[:] = bytes(self.size)
+                FILE_HEADER.pack_into(self.map, 0, MAGIC, slots, slot_size, 0)
+
+    @contextmanager
+    def _locked(self, operation):
+        with self.lock:
+            if fcntl is not None:
+                fcntl.flock(self.fd, operation)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def shared(self):
+        return self._locked(fcntl.LOCK_SH if fcntl else None)
+
+    def exclusive(self):
+        return self._locked(fcntl.LOCK_EX if fcntl else None)
+
+    def next_sequence(self):
+        magic, slots, slot_size, sequence = FILE_HEADER.unpack_from(
+            self.map, 0)
+        FILE_HEADER.pack_into(self.map, 0, magic, slots, slot_size,
+                              sequence + 1)
+        return sequence + 1
+
+    def offset(self, index):
+        return FILE_HEADER_SIZE + index * self.slot_size
+
+    def header(self, index):
+        return SLOT_HEADER.unpack_from(self.map, self.offset(index))
+
+    def touch(self, index):
+        struct.pack_into("<d", self.map, self.offset(index) + 16, time.time())
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._location = location
+        self._slots = int(options.get("SLOTS", 2048))
+        self._slot_size = int(options.get("SLOT_SIZE", 32768))
+        self._capacity = self._slot_size - SLOT_HEADER.size
+        self._local = _local_caches.setdefault(location, OrderedDict())
+        self._local_lock = _local_locks.setdefault(location, threading.Lock())
+
+    @property
+    def _file(self):
+        # После fork каждому процессу нужен свой дескриптор: flock
+        # на общем дескрипторе процессы друг от друга не защищает.
+        key = (self._location, self._slots, self._slot_size, os.getpid())
+        shared = _files.get(key)
+        if shared is None:
+            with _files_lock:
+                shared = _files.get(key)
+                if shared is None:
+                    shared = _SharedFile(self._location, self._slots,
+                                         self._slot_size)
+                    _files[key] = shared
+        return shared
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def _probe(self, key_hash):
+        start = key_hash % self._slots
+        return [(start + step) % self._slots for step in range(PROBE)]
+
+    # Первый уровень.
+
+    def _local_get(self, key, key_hash):
+        with self._local_lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            self._local.move_to_end(key)
+        pickled, expires, index, sequence = entry
+        found_hash, _, found_sequence, _, length, _ = self._file.header(index)
+        if (found_hash, found_sequence) != (key_hash, sequence) or not length:
+            self._local_forget(key)
+            return None
+        if expires and expires <= time.time():
+            self._local_forget(key)
+            return None
+        self._file.touch(index)
+        return pickled
+
+    def _local_put(self, key, pickled, expires, index, sequence):
+        with self._local_lock:
+            self._local[key] = (pickled, expires, index, sequence)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_forget(self, key):
+        with self._local_lock:
+            self._local.pop(key, None)
+
+    # Второй уровень. Вызывается под блокировкой файла.
+
+    def _read(self, key, key_hash):
+        shared = self._file
+        for index in self._probe(key_hash):
+            found_hash, expires, sequence, _, length, flags = (
+                shared.header(index))
+            if found_hash != key_hash or not length:
+                continue
+            if expires and expires <= time.time():
+                return None
+            start = shared.offset(index) + SLOT_HEADER.size
+            payload = shared.map[start:start + length]
+            if flags & COMPRESSED:
+                payload = zlib.decompress(payload)
+            key_length = struct.unpack_from("<H", payload)[0]
+            if payload[2:2 + key_length].decode() != key:
+                return None
+            return index, sequence, expires, payload[2 + key_length:]
+        return None
+
+    def _choose_slot(self, key_hash):
+        shared = self._file
+        now = time.time()
+        victim, victim_atime = None, None
+        for index in self._probe(key_hash):
+            found_hash, expires, _, atime, length, _ = shared.header(index)
+            if found_hash == key_hash:
+                return index
+            if not length or (expires and expires <= now):
+                atime = -1.0
+            if victim is None or atime < victim_atime:
+                victim, victim_atime = index, atime
+        return victim
+
+    def _write(self, key, key_hash, pickled, expires):
+        raw_key = key.encode()
+        payload = struct.pack("<H", len(raw_key)) + raw_key + pickled
+        flags = 0
+        if len(payload) > COMPRESS_MIN:
+            compressed = zlib.compress(payload)
+            if len(compressed) < len(payload):
+                payload, flags = compressed, COMPRESSED
+        if len(payload) > self._capacity:
+            self._erase(key_hash)
+            return None
+        shared = self._file
+        index = self._choose_slot(key_hash)
+        sequence = shared.next_sequence()
+        start = shared.offset(index)
+        body = start + SLOT_HEADER.size
+        shared.map[body:body + len(payload)] = payload
+        SLOT_HEADER.pack_into(shared.map, start, key_hash, expires or 0.0,
+                              sequence, time.time(), len(payload), flags)
+        return index, sequence
+
+    def _erase(self, key_hash):
+        shared = self._file
+        for index in self._probe(key_hash):
+            found_hash, _, _, _, length, _ = shared.header(index)
+            if found_hash == key_hash and length:
+                SLOT_HEADER.pack_into(shared.map, shared.offset(index),
+                                      0, 0.0, shared.next_sequence(),
+                                      0.0, 0, 0)
+                return True
+        return False
+
+    def _store(self, key, value, timeout):
+        key_hash = self._hash(key)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        written = self._write(key, key_hash, pickled, expires)
+        if written is None:
+            self._local_forget(key)
+            return False
+        self._local_put(key, pickled, expires, *written)
+        return True
+
+    # Интерфейс Django.
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        key_hash = self._hash(key)
+        pickled = self._local_get(key, key_hash)
+        if pickled is None:
+            with self._file.shared():
+                found = self._read(key, key_hash)
+            if found is None:
+                return default
+            index, sequence, expires, pickled = found
+            self._local_put(key, pickled, expires, index, sequence)
+            self._file.touch(index)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._file.exclusive():
+            return self._store(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._file.exclusive():
+            if self._read(key, self._hash(key)) is not None:
+                return False
+            return self._store(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._file.exclusive():
+            found = self._read(key, self._hash(key))
+            if found is None:
+                return False
+            return self._store(key, pickle.loads(found[3]), timeout)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        key_hash = self._hash(key)
+        with self._file.exclusive():
+            found = self._read(key, key_hash)
+            if found is None:
+                raise ValueError(f"Key '{key}' not found")
+            _, _, expires, pickled = found
+            value = pickle.loads(pickled) + delta
+            self._local_forget(key)
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            written = self._write(key, key_hash, pickled, expires)
+            if written is not None:
+                self._local_put(key, pickled, expires, *written)
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._local_forget(key)
+        with self._file.exclusive():
+            return self._erase(self._hash(key))
+
+    def has_key(self, key, version=None):
+        sentinel = object()
+        return self.get(key, sentinel, version=version) is not sentinel
+
+    def clear(self):
+        with self._local_lock:
+            self._local.clear()
+        shared = self._file
+        with shared.exclusive():
+            sequence = shared.next_sequence()
+            shared.map[FILE_HEADER_SIZE:] = bytes(shared.size
+                                                  - FILE_HEADER_SIZE)
+            FILE_HEADER.pack_into(shared.map, 0, MAGIC, self._slots,
+                                  self._slot_size, sequence)
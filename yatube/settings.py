@@ -82,6 +82,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
 
 
 # Database
@@ -150,9 +151,98 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+FOLLOWS_PER_PAGE = 30
+GROUPS_PER_PAGE = 30
+NOTIFICATIONS_PER_PAGE = 30
+# Replies deeper than this attach to the deepest allowed ancestor;
+# a comment accepts at most COMMENT_MAX_REPLIES direct replies.
+COMMENT_MAX_DEPTH = 3
+COMMENT_MAX_REPLIES = 10
+
+# Cached feed fragments live until a write bumps their generation
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Whole pages for anonymous readers, invalidated the same way
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Follow feed timelines; fan-out doesn't cut them, so the trim_timelines
+# command should run on a schedule to keep them at TIMELINE_LENGTH
+
+TIMELINE_LENGTH = 800
+TIMELINE_BACKFILL = 50
+TIMELINE_FANOUT_LIMIT = 1000
+FOLLOW_BULK_LIMIT = 100
+
+# Likes: each like adds to one of LIKE_SHARDS rows, flush_likes folds
+# them into the post counter
+
+LIKE_SHARDS = 8
+LIKE_BULK_LIMIT = 100
+
+# Unread follow-feed posts and notifications are counted up to
+# UNREAD_LIMIT, then shown as "99+"
+
+UNREAD_LIMIT = 99
+
+# Trending posts and groups: event weights decay by half every
+# TRENDING_HALF_LIFE seconds; compact_trending keeps the best
+# TRENDING_SIZE entries above TRENDING_MIN_SCORE
+
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_POST_WEIGHT = 2.0
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_SIZE = 500
+TRENDING_MIN_SCORE = 0.05
+TRENDING_POSTS_SHOWN = 20
+TRENDING_GROUPS_SHOWN = 5
+# Scores change with every post and comment, so the leaderboards are
+# cached for a short while instead of by generation
+
+TRENDING_CACHE_TIMEOUT = 60
+
+# "Who to follow", precomputed by the build_suggestions command
+
+SUGGESTIONS_COUNT = 20
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_COFOLLOW_WEIGHT = 0.5
+# Authors with more followers than this say little about taste and
+# are skipped when looking for similar readers.
+SUGGESTIONS_MAX_FANOUT = 1000
+
+# New-post notifications, streamed by yatube.asgi. Only the ASGI entry
+# point serves the stream, so it sets YATUBE_EVENTS_URL; under WSGI the
+# URL stays None and pages don't open the stream.
+
+EVENTS_URL = os.environ.get('YATUBE_EVENTS_URL')
+EVENTS_KEEPALIVE = 25
+
+# Uploaded post images are re-encoded to fit this box
+
+POST_IMAGE_MAX_SIZE = (2560, 2560)
+
+# Post image thumbnails, generated in a process pool after upload.
+# With zero workers they are generated in-process after commit.
+
+POST_IMAGE_GEOMETRY = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+THUMBNAIL_WORKERS = 2
+
+# Tests run with the cache file (and other files they write) moved to a
+# temporary directory, see yatube/testing.py
+
+TEST_RUNNER = 'yatube.testing.TestRunner'
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'yatube.bin'),
+        'OPTIONS': {
+            'SLOTS': 2048,
+            'SLOT_SIZE': 32768,
+            'MAX_ENTRIES': 512,
+        },
     }
 }
\ No newline at end of file
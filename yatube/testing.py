@@ -0,0 +1,42 @@
+"""Окружение тестов во временном каталоге.
+
+Иначе ``cache.clear()`` в тестах очищает общий mmap-файл кэша
+разработчика, а загруженные картинки остаются в ``media/`` проекта.
+Процессы пула миниатюр не видят ни этих настроек, ни тестовой базы,
+поэтому миниатюры строятся в том же процессе. Подключается и к
+``manage.py test`` (``TEST_RUNNER``), и к pytest (``tests/conftest.py``).
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def isolated():
+    """Настройки, указывающие файлы тестов во временный каталог."""
+    directory = tempfile.mkdtemp()
+    caches = {alias: dict(config, LOCATION=os.path.join(directory,
+                                                        f"{alias}.bin"))
+              for alias, config in settings.CACHES.items()}
+    try:
+        with override_settings(CACHES=caches, THUMBNAIL_WORKERS=0,
+                               MEDIA_ROOT=os.path.join(directory, "media")):
+            yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated = isolated()
+        self._isolated.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)